@@ -0,0 +1,207 @@
+import asyncio
+import time
+from collections import deque
+
+from fastapi.responses import ORJSONResponse
+from starlette.routing import Match
+
+from config import ADMISSION_ENABLED, ADMISSION_LIMITS, HASH_WORKERS
+from metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_SHED
+
+
+# Control de admisión por clase de ruta. Cada clase tiene un máximo de
+# peticiones en curso y una cola corta con espera acotada; lo que no cabe se
+# rechaza al momento con 503 + Retry-After, en lugar de esperar 30 s por una
+# conexión del pool y arrastrar a las rutas baratas.
+
+# Clase de cada ruta ("MÉTODO plantilla"; los montajes solo por ruta).
+# Las rutas sin clase usan "default"; las de clase "exempt" no se limitan
+# (página de inicio, assets, comprobación de sesión, logout y métricas).
+ROUTE_CLASSES = {
+    "GET /": "exempt",
+    "/assets": "exempt",
+    "GET /users/me": "exempt",
+    "GET /users/me/profile": "exempt",
+    "POST /logout": "exempt",
+    "POST /logout/all": "exempt",
+    "GET /metrics": "exempt",
+    "GET /metrics/hashing": "exempt",
+    "GET /metrics/pool": "exempt",
+    "GET /metrics/cache": "exempt",
+    "GET /metrics/ratelimit": "exempt",
+    "GET /metrics/admission": "exempt",
+    "GET /metrics/events": "exempt",
+    # Conexiones SSE de larga duración: las limita EVENTS_MAX_CLIENTS
+    "GET /users/events": "exempt",
+    # bcrypt: el login aparte para que las altas y cambios no lo bloqueen
+    "POST /token": "login",
+    "POST /users/me/create": "hashing",
+    "PUT /users/me/update_profile": "hashing",
+    "PUT /users/me/{user_id}": "hashing",
+    # Listados: consultas y renderizado proporcionales al tamaño de página
+    "GET /users/me/show": "listing",
+    "GET /users/me/register_show": "listing",
+    "GET /users/search": "listing",
+    # Operaciones masivas: ocupan una conexión durante mucho tiempo
+    "GET /users/export": "bulk",
+    "POST /users/bulk": "bulk",
+    "PATCH /users/batch": "bulk",
+    "POST /users/batch/delete": "bulk",
+}
+
+# clase: (peticiones en curso, tamaño de la cola, espera máxima en segundos)
+DEFAULT_LIMITS = {
+    "login": (max(4, HASH_WORKERS * 2), 32, 1.0),
+    "hashing": (max(2, HASH_WORKERS), 16, 1.0),
+    "listing": (8, 16, 0.25),
+    "bulk": (2, 4, 1.0),
+    "default": (16, 32, 0.25),
+}
+
+
+# "listing=8/16/250,bulk=1/2/500" (concurrencia/cola/espera en ms) sobre los valores por defecto
+def parse_limits(spec: str, defaults: dict = DEFAULT_LIMITS) -> dict:
+    limits = dict(defaults)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, values = item.partition("=")
+        concurrency, queue_size, wait_ms = (int(value) for value in values.split("/"))
+        limits[name.strip()] = (concurrency, queue_size, wait_ms / 1000)
+    return limits
+
+
+class Shed(Exception):
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+# Semáforo con cola FIFO acotada. Al liberar un hueco se entrega directamente
+# al primero de la cola, así no se adelanta una petición recién llegada.
+class ConcurrencyLimiter:
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.shed = 0
+
+    # Devuelve los segundos de espera en la cola o lanza Shed
+    async def acquire(self) -> float:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return 0.0
+        if len(self._waiters) >= self.queue_size:
+            self.shed += 1
+            raise Shed("queue_full")
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            # Tiempo agotado o cliente desconectado. release() pudo haberle
+            # entregado ya el hueco justo antes: en ese caso se devuelve
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._remove(waiter)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            self.shed += 1
+            raise Shed("timeout")
+        self.admitted += 1
+        return time.perf_counter() - start
+
+    def _remove(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "max_wait_seconds": self.max_wait,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+class AdmissionControl:
+    def __init__(self, limits: dict, route_classes: dict = ROUTE_CLASSES, enabled: bool = True):
+        self.enabled = enabled
+        self.route_classes = route_classes
+        self.limiters = {
+            name: ConcurrencyLimiter(name, *values) for name, values in limits.items()
+        }
+
+    # Clase de la petición y ruta que la atenderá (el mismo emparejamiento que
+    # hace el router, sin ejecutar nada)
+    def classify(self, routes, scope):
+        for route in routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                methods = getattr(route, "methods", None)
+                if not methods:
+                    return self.route_classes.get(route.path, "default"), route
+                method = "GET" if scope["method"] == "HEAD" else scope["method"]
+                return self.route_classes.get(f"{method} {route.path}", "default"), route
+        return "exempt", None
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **{name: limiter.stats() for name, limiter in self.limiters.items()}}
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, control: AdmissionControl, routes):
+        self.app = app
+        self.control = control
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.control.enabled:
+            await self.app(scope, receive, send)
+            return
+        route_class, route = self.control.classify(self.routes, scope)
+        limiter = self.control.limiters.get(route_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            waited = await limiter.acquire()
+        except Shed as exc:
+            ADMISSION_SHED.inc(limiter.name, exc.reason)
+            # Para que las métricas HTTP cuenten el 503 en su ruta
+            scope["route"] = route
+            response = ORJSONResponse(
+                status_code=503,
+                content={"detail": "Servidor ocupado, intente de nuevo"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        ADMISSION_QUEUE_SECONDS.observe(waited, limiter.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+admission_control = AdmissionControl(parse_limits(ADMISSION_LIMITS), enabled=ADMISSION_ENABLED)
@@ -0,0 +1,109 @@
+// Cambios del directorio en tiempo real: en lugar de recargar la página tras
+// crear, actualizar o borrar un usuario, se aplican los eventos de
+// /users/events sobre las filas de la tabla.
+(function() {
+    const FIELDS = [
+        ['ID', 'id'],
+        ['Nombres', 'first_name'],
+        ['Apellidos', 'last_name'],
+        ['Correo Electrónico', 'username'],
+        ['Fecha de Nacimiento', 'dob'],
+        ['Lugar de Nacimiento', 'location'],
+        ['Puesto Profesional', 'bio']
+    ];
+
+    function tableBody() {
+        return document.querySelector('#directory-table tbody');
+    }
+
+    function findRow(id) {
+        return document.querySelector(`#directory-table tr[data-user-id="${id}"]`);
+    }
+
+    // Mismo texto que la plantilla (Jinja muestra None para los valores vacíos)
+    function setField(row, field, value) {
+        const cell = row.querySelector(`[data-field="${field}"]`);
+        if (cell) {
+            cell.textContent = value === null || value === undefined ? 'None' : value;
+        }
+    }
+
+    function createRow(user) {
+        const row = document.createElement('tr');
+        row.dataset.userId = user.id;
+        for (const [label, field] of FIELDS) {
+            const cell = document.createElement('td');
+            const span = document.createElement('span');
+            cell.dataset.label = label;
+            span.dataset.field = field;
+            cell.appendChild(span);
+            row.appendChild(cell);
+            setField(row, field, user[field]);
+        }
+        return row;
+    }
+
+    // Tabla de la página actual otra vez desde el servidor (solo si se perdieron eventos)
+    async function reloadTable() {
+        try {
+            const response = await fetch(window.location.href, { credentials: 'include' });
+            if (!response.ok) {
+                return;
+            }
+            const page = new DOMParser().parseFromString(await response.text(), 'text/html');
+            const fresh = page.getElementById('directory-table');
+            const current = document.getElementById('directory-table');
+            if (fresh && current) {
+                current.replaceWith(fresh);
+            }
+        } catch (error) {
+            console.error('Error al recargar la tabla:', error);
+        }
+    }
+
+    function onCreated(event) {
+        const body = tableBody();
+        const table = document.querySelector('#directory-table table');
+        // Los ids nuevos son los mayores: solo aparecen en la última página
+        if (!body || table.dataset.hasNext === 'true') {
+            return;
+        }
+        for (const user of JSON.parse(event.data).users) {
+            if (!findRow(user.id)) {
+                body.appendChild(createRow(user));
+            }
+        }
+    }
+
+    function onUpdated(event) {
+        for (const user of JSON.parse(event.data).users) {
+            const row = findRow(user.id);
+            if (!row) {
+                continue;
+            }
+            for (const field of Object.keys(user)) {
+                if (field !== 'id') {
+                    setField(row, field, user[field]);
+                }
+            }
+        }
+    }
+
+    function onDeleted(event) {
+        for (const id of JSON.parse(event.data).ids) {
+            const row = findRow(id);
+            if (row) {
+                row.remove();
+            }
+        }
+    }
+
+    if (!window.EventSource || !document.getElementById('directory-table')) {
+        return;
+    }
+    const source = new EventSource('/users/events', { withCredentials: true });
+    source.addEventListener('created', onCreated);
+    source.addEventListener('updated', onUpdated);
+    source.addEventListener('deleted', onDeleted);
+    source.addEventListener('reset', reloadTable);
+})();
@@ -29,7 +29,13 @@ document.getElementById("profile-form").addEventListener("submit", async functio
 
         if (response.ok) {
             alert("Perfil actualizado con éxito.");
-            location.reload(); 
+            // Sin recargar la página: el formulario ya tiene los datos nuevos,
+            // solo cambian el nombre de la barra lateral y las contraseñas
+            document.querySelector(".navbar .nav-item").lastChild.textContent =
+                " " + userDetails.first_name + " " + userDetails.last_name;
+            for (const id of ["current-password", "new-password", "confirm-password"]) {
+                document.getElementById(id).value = "";
+            }
         } else {
             const errorData = await response.json();
             console.error("Error:", errorData);
@@ -0,0 +1,186 @@
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Depends, HTTPException, status
+from fastapi.responses import RedirectResponse
+from jose import JWTError, jwt
+from starlette.requests import Request
+
+from config import (
+    SECRET_KEY, ALGORITHM, SESSION_INACTIVITY_MINUTES, SESSION_WINDOW_SECONDS, SESSION_REFRESH_RATIO,
+    TOKEN_CACHE_SIZE
+)
+from cache import LRUCache, profile_objects
+from database import DBSession, get_db
+from metrics import JWT_SECONDS
+from services import get_services
+
+
+# Excepción para cortar una petición desde una dependencia devolviendo
+# directamente una respuesta (por ejemplo, la redirección al login)
+class SessionRedirect(Exception):
+    def __init__(self, response):
+        self.response = response
+
+async def session_redirect_handler(request: Request, exc: SessionRedirect):
+    return exc.response
+
+
+# Función para crear el token de acceso.
+# `iat` marca la última actividad registrada y `exp` el fin de la ventana de
+# inactividad, ambos como enteros (segundos Unix) en lugar de fechas ISO.
+# `jti` identifica la sesión y `auth_time` el login; las renovaciones los
+# conservan, así revocar el jti invalida también los tokens anteriores.
+def create_access_token(data: dict):
+    to_encode = data.copy()
+    to_encode.pop('last_activity', None)
+    if not to_encode.get('jti'):
+        to_encode['jti'] = secrets.token_urlsafe(12)
+    if not to_encode.get('auth_time'):
+        to_encode['auth_time'] = round(time.time(), 3)
+    now = int(time.time())
+    to_encode['iat'] = now
+    to_encode['exp'] = now + SESSION_WINDOW_SECONDS
+    with JWT_SECONDS.time("encode"):
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+# Segundos Unix de la última actividad (los tokens antiguos la guardaban en ISO)
+def activity_timestamp(last_activity):
+    if isinstance(last_activity, str):
+        return datetime.fromisoformat(last_activity).timestamp()
+    return last_activity
+
+# Verificar si la sesión está expirada por inactividad
+def is_session_expired(last_activity, inactivity_limit_minutes: int = SESSION_INACTIVITY_MINUTES):
+    inactivity_duration = time.time() - activity_timestamp(last_activity)
+    return inactivity_duration > inactivity_limit_minutes * 60
+
+# El token solo se vuelve a firmar cuando ha pasado SESSION_REFRESH_RATIO de la
+# ventana. Así la inactividad tolerada queda entre (1 - ratio) * ventana y la
+# ventana completa, a cambio de no firmar ni enviar Set-Cookie en cada página.
+def needs_refresh(last_activity):
+    elapsed = time.time() - activity_timestamp(last_activity)
+    return elapsed >= SESSION_WINDOW_SECONDS * SESSION_REFRESH_RATIO
+
+
+# Tokens ya verificados: la misma cadena implica la misma firma, así que los
+# tokens frecuentes se saltan el HMAC y el parseo. La caducidad se comprueba igual.
+token_cache = LRUCache(TOKEN_CACHE_SIZE, ttl=SESSION_WINDOW_SECONDS)
+
+def decode_token(token: str):
+    payload = token_cache.get(token)
+    if payload is None:
+        # La expiración se comprueba aparte para distinguir "sesión expirada" de "token inválido"
+        with JWT_SECONDS.time("decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+        token_cache.set(token, payload)
+    return payload
+
+def set_token_cookie(response, token: str):
+    response.set_cookie(
+        key="access_token",
+        value=token,
+        httponly=True,
+        secure=True,
+        samesite="Lax"
+    )
+
+def set_no_cache_headers(response):
+    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
+    response.headers["Pragma"] = "no-cache"
+    response.headers["Expires"] = "0"
+
+# Redirección al inicio avisando de que la sesión expiró
+def expired_session_response():
+    response = RedirectResponse("/", status_code=302)
+    response.delete_cookie(key="access_token")
+
+    expires_in = datetime.now(timezone.utc) + timedelta(seconds=3)
+
+    response.set_cookie(
+        key="session_expired",
+        value="true",
+        httponly=True,
+        secure=True,
+        samesite="Lax",
+        max_age=3,
+        expires=expires_in
+    )
+    return response
+
+
+# Usuario autenticado de la petición actual (perfil leído de la caché,
+# sin la contraseña; las rutas que escriben vuelven a cargar la fila)
+class CurrentUser:
+    def __init__(self, user, details, payload: dict, token: str = None):
+        self.user = user
+        self.details = details
+        self.payload = payload
+        self.token = token
+
+    @property
+    def full_name(self):
+        if self.details is None:
+            return self.user.username
+        return f'{self.details.first_name} {self.details.last_name}'
+
+    # Renueva la cookie de sesión (solo si hubo que firmar un token nuevo)
+    # y desactiva la caché en la respuesta
+    def apply(self, response):
+        if self.token:
+            set_token_cookie(response, self.token)
+        set_no_cache_headers(response)
+        return response
+
+
+async def _load_current_user(request: Request, db: DBSession, api: bool):
+    def reject(response=None):
+        if api:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+        if response is None:
+            # Sin borrar la cookie, "/" volvería a redirigir a /users/me (bucle)
+            response = RedirectResponse("/", status_code=302)
+            response.delete_cookie(key="access_token")
+        raise SessionRedirect(response)
+
+    token = request.cookies.get("access_token")
+    if not token:
+        reject()
+
+    try:
+        payload = decode_token(token)
+    except JWTError:
+        reject()
+
+    last_activity = payload.get("iat", payload.get("last_activity"))
+    if not last_activity or is_session_expired(last_activity):
+        reject(expired_session_response())
+
+    # Sesión cerrada (logout o "cerrar todas las sesiones"): comprobación en memoria
+    services = get_services(request)
+    if services.token_revocations.is_revoked(payload):
+        reject(expired_session_response())
+
+    # Usuario y detalles en una sola consulta (o desde la caché de perfiles)
+    profile = await services.profile_cache.get_by_username(db, payload.get("sub"))
+    if profile is None:
+        reject()
+    user, details = profile_objects(profile)
+
+    # Actualizar el timestamp de la última actividad solo al superar el umbral
+    new_token = None
+    if needs_refresh(last_activity):
+        new_token = create_access_token({
+            "sub": payload.get("sub"), "jti": payload.get("jti"), "auth_time": payload.get("auth_time")
+        })
+    return CurrentUser(user, details, payload, new_token)
+
+# Dependencia para las páginas HTML: redirige al inicio si no hay sesión válida
+async def current_user(request: Request, db: DBSession = Depends(get_db)):
+    return await _load_current_user(request, db, api=False)
+
+# Dependencia para las rutas JSON: responde 401 si no hay sesión válida
+async def current_user_api(request: Request, db: DBSession = Depends(get_db)):
+    return await _load_current_user(request, db, api=True)
@@ -0,0 +1,178 @@
+import time
+from collections import Counter
+from typing import Optional
+
+from pydantic import BaseModel, field_validator
+from sqlalchemy import bindparam, delete, select, update
+
+from crud import DETAIL_FIELDS
+from models import UserDB, UserDetailsDB
+
+
+# Cambios de un usuario en PATCH /users/batch: solo se actualizan los campos enviados
+class BatchUpdateItem(BaseModel):
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    dob: Optional[str] = None
+    location: Optional[str] = None
+    bio: Optional[str] = None
+
+    @field_validator("first_name", "last_name")
+    @classmethod
+    def not_blank(cls, value):
+        if value is None or not value.strip():
+            raise ValueError("no puede estar vacío")
+        return value
+
+    def changes(self) -> dict:
+        return self.model_dump(include=set(DETAIL_FIELDS) & self.model_fields_set)
+
+# Las dos operaciones por lotes piden una vez la contraseña de quien las hace
+# (una comprobación por petición, no una por usuario del lote)
+class BatchUpdateRequest(BaseModel):
+    current_password: str
+    items: list[BatchUpdateItem]
+
+class BatchDeleteRequest(BaseModel):
+    current_password: str
+    ids: list[int]
+
+
+def chunks(values: list, size: int):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _result(user_id, status: str, error: str = None):
+    return {"id": user_id, "status": status, "error": error}
+
+# Ids que aparecen más de una vez en el lote: no se aplica ninguno, porque no
+# está claro cuál de los cambios es el bueno
+def _repeated(ids: list) -> set:
+    return {user_id for user_id, count in Counter(ids).items() if count > 1}
+
+# Actualización por lotes en una sola transacción, con una entrada de
+# resultados por elemento del lote, en el mismo orden. Por cada trozo de
+# `chunk_size` usuarios: un SELECT ... IN de users con sus detalles (un usuario
+# sin fila de detalles no se cuenta como actualizado) y
+#   - un UPDATE ... WHERE user_id IN (...) por cada grupo de usuarios con los
+#     mismos cambios (p. ej. la misma ubicación para cientos de usuarios),
+#   - un UPDATE con executemany por cada combinación de campos del resto.
+# version y updated_at se actualizan en la propia sentencia (onupdate).
+def apply_batch_update(db, items: list, chunk_size: int) -> dict:
+    started = time.perf_counter()
+    results = [None] * len(items)
+    repeated = _repeated([item.id for item in items])
+    pending = []
+    for position, item in enumerate(items):
+        values = item.changes()
+        if item.id in repeated:
+            results[position] = _result(item.id, "invalid", "Usuario repetido en el lote")
+        elif not values:
+            results[position] = _result(item.id, "invalid", "Sin cambios")
+        else:
+            pending.append((position, item.id, values))
+
+    affected = {}
+    statements = 0
+    try:
+        for chunk in chunks(pending, chunk_size):
+            rows = db.execute(
+                select(UserDB.id, UserDB.username, UserDetailsDB.user_id)
+                .outerjoin(UserDetailsDB, UserDetailsDB.user_id == UserDB.id)
+                .where(UserDB.id.in_([user_id for _, user_id, _ in chunk]))
+            ).all()
+            statements += 1
+            users = {user_id: (username, details_id is not None) for user_id, username, details_id in rows}
+            groups = {}
+            for position, user_id, values in chunk:
+                user = users.get(user_id)
+                if user is None:
+                    results[position] = _result(user_id, "not_found", "Usuario no encontrado")
+                elif not user[1]:
+                    results[position] = _result(user_id, "not_found", "Usuario sin detalles")
+                else:
+                    groups.setdefault(tuple(sorted(values.items())), []).append(user_id)
+                    results[position] = _result(user_id, "updated")
+                    affected[user_id] = user[0]
+            statements += _update_groups(db, groups)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return _report(items, results, affected, chunk_size, statements, started)
+
+# Cambios idénticos: un UPDATE ... IN; el resto, agrupado por campos.
+# Devuelve el número de sentencias ejecutadas
+def _update_groups(db, groups: dict) -> int:
+    statements = 0
+    by_fields = {}
+    for key, user_ids in groups.items():
+        if len(user_ids) > 1:
+            db.execute(update(UserDetailsDB).where(UserDetailsDB.user_id.in_(user_ids)).values(dict(key)))
+            statements += 1
+        else:
+            by_fields.setdefault(tuple(name for name, _ in key), []).append(
+                {"b_user_id": user_ids[0], **{f"b_{name}": value for name, value in key}}
+            )
+    for fields, params in by_fields.items():
+        stmt = (
+            update(UserDetailsDB.__table__)
+            .where(UserDetailsDB.user_id == bindparam("b_user_id"))
+            .values({name: bindparam(f"b_{name}") for name in fields})
+        )
+        db.execute(stmt, params)
+        statements += 1
+    return statements
+
+
+# Borrado por lotes en una sola transacción: por cada trozo, un SELECT ... IN
+# y un DELETE ... IN de users; los detalles se borran con ON DELETE CASCADE.
+# Se borran también explícitamente (otro DELETE ... IN) porque en las tablas
+# creadas antes de añadir la cascada la clave foránea no la tiene.
+def apply_batch_delete(db, ids: list, chunk_size: int) -> dict:
+    started = time.perf_counter()
+    repeated = _repeated(ids)
+    unique = [user_id for user_id in dict.fromkeys(ids) if user_id not in repeated]
+
+    affected = {}
+    statements = 0
+    try:
+        for chunk in chunks(unique, chunk_size):
+            existing = dict(db.execute(select(UserDB.id, UserDB.username).where(UserDB.id.in_(chunk))).all())
+            statements += 1
+            if existing:
+                found = list(existing)
+                db.execute(delete(UserDetailsDB).where(UserDetailsDB.user_id.in_(found)))
+                db.execute(delete(UserDB).where(UserDB.id.in_(found)))
+                statements += 2
+                affected.update(existing)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    results = []
+    for user_id in ids:
+        if user_id in repeated:
+            results.append(_result(user_id, "invalid", "Usuario repetido en el lote"))
+        elif user_id in affected:
+            results.append(_result(user_id, "deleted"))
+        else:
+            results.append(_result(user_id, "not_found", "Usuario no encontrado"))
+    return _report(ids, results, affected, chunk_size, statements, started)
+
+
+def _report(requested: list, results: list, affected: dict, chunk_size: int, statements: int, started: float) -> dict:
+    return {
+        "affected": affected,
+        "results": results,
+        "stats": {
+            "items": len(requested),
+            "applied": len(affected),
+            "failed": len(results) - len(affected),
+            "chunk_size": chunk_size,
+            "statements": statements,
+            "elapsed_seconds": time.perf_counter() - started,
+        },
+    }
@@ -0,0 +1,9 @@
+"""Benchmarks de la aplicación (ejecutar desde la raíz del proyecto).
+
+    python -m benchmarks.run --users 10000 --concurrency 1 8 32 --output resultados.json
+    python -m benchmarks.compare base.json resultados.json
+    python -m benchmarks.bench_search --rows 100000 --backend like fts
+    python -m benchmarks.bench_serialization --users 1000
+    python -m benchmarks.bench_startup --runs 15
+    python -m benchmarks.bench_directory --users 10000
+"""
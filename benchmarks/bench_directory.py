@@ -0,0 +1,86 @@
+"""Directorio de usuarios con y sin la caché de fragmentos.
+
+Siembra una base de datos SQLite temporal y mide GET /users/me/show con la
+página completa (--users filas por página): con la caché vacía en cada
+petición (consulta + bucle de Jinja, lo que se hacía siempre antes) y con el
+fragmento en caché (solo el marco de la página).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_directory --users 10000 --repeat 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+def configure_environment(users: int, bcrypt_rounds: int) -> str:
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'directory.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    os.environ["USERS_MAX_PAGE_SIZE"] = str(users)
+    os.environ["LOGIN_LIMIT_PER_IP"] = str(10 ** 9)
+    os.environ["LOGIN_LIMIT_PER_USERNAME"] = str(10 ** 9)
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+    return database_url
+
+
+async def measure(client, path: str, repeat: int, before_each=None) -> dict:
+    from benchmarks.common import summarize
+
+    timings = []
+    size = 0
+    for _ in range(repeat + 1):
+        if before_each is not None:
+            before_each()
+        start = time.perf_counter()
+        response = await client.get(path, headers={"Accept-Encoding": "identity"})
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+        size = len(response.content)
+    return {**summarize(timings[1:]), "bytes": size}  # la primera es de calentamiento
+
+
+async def run(users: int, repeat: int, bcrypt_rounds: int) -> dict:
+    import httpx
+
+    from benchmarks.common import seed_username
+    from benchmarks.load import PASSWORD
+    from benchmarks.run import prepare_database
+    from config import Settings
+    import main as app_module
+
+    engine, _ = prepare_database(os.environ["DATABASE_URL"], users, bcrypt_rounds)
+    engine.dispose()
+    app = app_module.create_app(Settings())
+    path = f"/users/me/show?page_size={users}"
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        directory_cache = app.state.services.directory_cache
+        async with httpx.AsyncClient(transport=transport, base_url="https://testserver") as client:
+            response = await client.post("/token", data={"username": seed_username(1), "password": PASSWORD})
+            response.raise_for_status()
+            report = {
+                "users": users,
+                "sin caché (consulta + tabla + página)": await measure(client, path, repeat, directory_cache.bump),
+                "con caché (solo la página)": await measure(client, path, repeat),
+                "cache": directory_cache.stats(),
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    args = parser.parse_args()
+    configure_environment(args.users, args.bcrypt_rounds)
+    print(json.dumps(asyncio.run(run(args.users, args.repeat, args.bcrypt_rounds)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Latencia de /users/search con distintos tamaños de tabla y backends.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_search --rows 100000 1000000 --backend like fts
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from benchmarks.common import CITIES, FIRST_NAMES, LAST_NAMES
+from models import Base
+from search import SQLiteFTSBackend, LikeSearchBackend, search_users
+
+
+# (descripción, q, campos, modo)
+QUERIES = [
+    ("prefijo apellido", "Rodr", ["name"], "prefix"),
+    ("prefijo correo", "user12345", ["email"], "prefix"),
+    ("subcadena correo", "2345@", ["email"], "substring"),
+    ("subcadena lugar", "requi", ["location"], "substring"),
+    ("prefijo todos", "Quis", ["name", "email", "location"], "prefix"),
+]
+
+BACKENDS = {"like": LikeSearchBackend, "fts": SQLiteFTSBackend}
+
+
+def seed(engine, rows: int, batch: int = 20000):
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        for start in range(1, rows + 1, batch):
+            ids = range(start, min(start + batch, rows + 1))
+            raw.executemany(
+                "INSERT INTO users (id, username, hashed_password) VALUES (?, ?, 'x')",
+                [(i, f"user{i}@example.com") for i in ids],
+            )
+            raw.executemany(
+                "INSERT INTO user_details (user_id, first_name, last_name, location) VALUES (?, ?, ?, ?)",
+                [(i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(CITIES)) for i in ids],
+            )
+
+
+def run(rows: int, backend_name: str, repeat: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+    engine = create_engine(f"sqlite:///{path}")
+    backend = BACKENDS[backend_name]()
+
+    Base.metadata.create_all(engine)
+    seed_start = time.perf_counter()
+    seed(engine, rows)
+    with engine.begin() as conn:
+        backend.install(conn)
+    seed_seconds = time.perf_counter() - seed_start
+
+    results = {}
+    with Session(engine) as db:
+        for label, q, fields, mode in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                search_users(db, backend, q, fields, mode, "id", False, 1, 50)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[label] = {
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+            }
+    engine.dispose()
+    os.remove(path)
+    return {"rows": rows, "backend": backend.name, "seed_seconds": round(seed_seconds, 2), "queries": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--backend", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    report = [run(rows, backend, args.repeat) for rows in args.rows for backend in args.backend]
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
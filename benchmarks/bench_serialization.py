@@ -0,0 +1,97 @@
+"""Coste de serializar las respuestas JSON: antes (jsonable_encoder + JSONResponse)
+y después (modelos de respuesta + ORJSONResponse, filas como tuplas).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_serialization --users 1000 --repeat 200
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from benchmarks.common import seed_users, summarize
+from models import Base, UserDB, UserDetailsDB
+from schemas import UserDetailsOut, UserSearchPage
+from search import RESULT_COLUMNS, RESULT_KEYS
+
+
+def bench(fn, repeat: int) -> dict:
+    fn()  # calentamiento
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+# Camino de FastAPI con response_model: validar, serializar con pydantic-core y codificar
+def via_model(adapter, content):
+    return ORJSONResponse(adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json"))
+
+
+def run(users: int, repeat: int) -> dict:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        seed_users(conn, users)
+
+    details_adapter = TypeAdapter(UserDetailsOut)
+    page_adapter = TypeAdapter(UserSearchPage)
+    meta = {"page": 1, "page_size": users, "next_page": None, "backend": "like"}
+    columns_query = select(*RESULT_COLUMNS).select_from(UserDB).outerjoin(UserDB.user_details)
+
+    with Session(engine) as db:
+        orm_details = db.get(UserDetailsDB, 1)
+        details = {field: getattr(orm_details, field) for field in UserDetailsOut.model_fields}
+        rows = db.execute(columns_query).all()
+
+        single = {
+            "antes: objeto ORM + jsonable_encoder": lambda: JSONResponse(jsonable_encoder(orm_details)),
+            "antes: dict + jsonable_encoder": lambda: JSONResponse(jsonable_encoder(details)),
+            "después: response_model + orjson (ORM)": lambda: via_model(details_adapter, orm_details),
+            "después: response_model + orjson (dict)": lambda: via_model(details_adapter, details),
+        }
+        listing = {
+            "antes: _asdict + jsonable_encoder": lambda: JSONResponse(
+                jsonable_encoder({"items": [row._asdict() for row in rows], **meta})),
+            "después: response_model + orjson (filas)": lambda: via_model(page_adapter, {"items": rows, **meta}),
+            "después: tuplas + orjson directo": lambda: ORJSONResponse(
+                {"items": [dict(zip(RESULT_KEYS, row)) for row in rows], **meta}),
+        }
+        # Incluye la consulta: entidades ORM frente a columnas
+        fetch = {
+            "antes: entidades ORM + jsonable_encoder": lambda: JSONResponse(jsonable_encoder([
+                {"user": user, "details": d}
+                for user, d in db.query(UserDB, UserDetailsDB).outerjoin(UserDB.user_details).all()
+            ])),
+            "después: columnas + orjson directo": lambda: ORJSONResponse({"items": [
+                dict(zip(RESULT_KEYS, row)) for row in db.execute(columns_query)
+            ], **meta}),
+        }
+
+        report = {
+            "users": users,
+            "un usuario": {name: bench(fn, repeat) for name, fn in single.items()},
+            f"{users} usuarios": {name: bench(fn, max(1, repeat // 10)) for name, fn in listing.items()},
+            f"{users} usuarios con consulta": {name: bench(fn, max(1, repeat // 10)) for name, fn in fetch.items()},
+        }
+    engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.users, args.repeat), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Tiempo de arranque: importar main, ejecutar el lifespan y servir la primera
+petición. Cada medición se hace en un proceso nuevo (sin módulos importados)
+y se informa la mediana.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_startup --runs 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+CHILD = """
+import asyncio
+import json
+import time
+
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+import httpx
+
+
+async def first_request():
+    app = main.app
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="https://testserver") as client:
+            response = await client.get("/")
+        served = time.perf_counter()
+    return started, served, response.status_code
+
+
+started, served, status = asyncio.run(first_request())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (started - imported) * 1000,
+    "first_request_ms": (served - started) * 1000,
+    "status": status,
+}))
+"""
+METRICS = ("import_ms", "startup_ms", "first_request_ms")
+
+
+def run(runs: int, database_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, BCRYPT_ROUNDS=os.environ.get("BCRYPT_ROUNDS", "4"))
+    env.setdefault("SECRET_KEY", "benchmark-secret-key-" + "x" * 32)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # El esquema se crea una vez, fuera de las mediciones (como en un despliegue)
+    subprocess.run([sys.executable, "manage.py", "create-schema"], env=env, cwd=root, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", CHILD], env=env, cwd=root,
+                             capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "status": samples[0]["status"],
+        **{metric: round(statistics.median(s[metric] for s in samples), 1) for metric in METRICS},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--database-url", help="por defecto, SQLite temporal")
+    args = parser.parse_args()
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    print(json.dumps(run(args.runs, database_url), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import random
+import statistics
+
+from sqlalchemy import insert
+
+from models import UserDB, UserDetailsDB
+
+
+FIRST_NAMES = ["Ana", "Luis", "María", "José", "Carmen", "Jorge", "Lucía", "Pedro", "Rosa", "Carlos",
+               "Elena", "Miguel", "Sofía", "Diego", "Valeria", "Andrés", "Paula", "Raúl", "Julia", "Hugo"]
+LAST_NAMES = ["García", "Rodríguez", "López", "Martínez", "Sánchez", "Pérez", "Gómez", "Flores", "Díaz",
+              "Torres", "Ramírez", "Vargas", "Castillo", "Rojas", "Mendoza", "Quispe", "Huamán", "Chávez"]
+CITIES = ["Lima", "Arequipa", "Cusco", "Trujillo", "Piura", "Quito", "Bogotá", "Madrid", "Santiago", "La Paz"]
+
+
+def seed_username(user_id: int) -> str:
+    return f"user{user_id}@example.com"
+
+
+# Inserta `rows` usuarios con ids 1..rows y datos deterministas (semilla fija),
+# por lotes de inserts multi-fila. Todos comparten `hashed_password`.
+def seed_users(connection, rows: int, hashed_password: str = "x", batch: int = 5000):
+    rng = random.Random(42)
+    for start in range(1, rows + 1, batch):
+        ids = range(start, min(start + batch, rows + 1))
+        connection.execute(insert(UserDB), [
+            {"id": i, "username": seed_username(i), "hashed_password": hashed_password} for i in ids
+        ])
+        connection.execute(insert(UserDetailsDB), [
+            {"user_id": i, "first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES),
+             "location": rng.choice(CITIES)}
+            for i in ids
+        ])
+
+
+# Resumen de una lista de latencias en segundos (se informa en milisegundos)
+def summarize(timings: list) -> dict:
+    if not timings:
+        return {"count": 0}
+    ordered = sorted(timings)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": round(percentile(0.50), 4),
+        "p95_ms": round(percentile(0.95), 4),
+        "p99_ms": round(percentile(0.99), 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
@@ -0,0 +1,90 @@
+"""Compara dos resultados de `benchmarks.run` (base y nuevo).
+
+Muestra p50/p95/p99 y peticiones/s de cada ruta y micro-benchmark con la
+variación porcentual. Termina con código 1 si algún p95 empeora más que
+--threshold (o el throughput baja más que ese porcentaje), para usarlo en CI.
+
+Uso:
+    python -m benchmarks.compare base.json nuevo.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+# {"load POST /token c=8": resumen, "micro verify_password": resumen, ...}
+def flatten(report: dict) -> dict:
+    rows = {}
+    for scenario, levels in report.get("load", {}).items():
+        for concurrency, summary in levels.items():
+            rows[f"load {scenario} c={concurrency}"] = summary
+    for name, summary in report.get("micro", {}).items():
+        rows[f"micro {name}"] = summary
+    return rows
+
+
+def change(base, new):
+    if base is None or new is None or not base:
+        return None
+    return (new - base) / base * 100
+
+
+# Una latencia que sube o un throughput que baja por encima del umbral es una regresión
+def is_regression(metric: str, delta, threshold: float) -> bool:
+    if delta is None:
+        return False
+    if metric == "throughput_rps":
+        return delta < -threshold
+    return metric == "p95_ms" and delta > threshold
+
+
+def compare(base: dict, new: dict, threshold: float):
+    base_rows, new_rows = flatten(base), flatten(new)
+    lines, regressions = [], []
+    for key in sorted(base_rows.keys() | new_rows.keys()):
+        if key not in base_rows or key not in new_rows:
+            lines.append(f"{key}: solo en {'nuevo' if key in new_rows else 'base'}")
+            continue
+        cells = []
+        for metric in METRICS:
+            before, after = base_rows[key].get(metric), new_rows[key].get(metric)
+            if before is None or after is None:
+                continue
+            delta = change(before, after)
+            flag = ""
+            if is_regression(metric, delta, threshold):
+                flag = " !"
+                regressions.append((key, metric, delta))
+            delta_text = f"{delta:+.1f}%" if delta is not None else "n/a"
+            cells.append(f"{metric} {before} -> {after} ({delta_text}){flag}")
+        lines.append(f"{key}\n    " + "\n    ".join(cells))
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="porcentaje tolerado")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"base: {base.get('meta', {}).get('revision')}  nuevo: {new.get('meta', {}).get('revision')}")
+    lines, regressions = compare(base, new, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regresiones por encima del {args.threshold}%:")
+        for key, metric, delta in regressions:
+            print(f"  {key} {metric} {delta:+.1f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import asyncio
+import random
+import time
+
+import httpx
+from sqlalchemy import select
+
+from benchmarks.common import seed_username, summarize
+from models import UserDB
+
+
+PASSWORD = "benchmark"
+NEW_USER_PREFIX = "bench-new-"
+
+
+# Estado compartido por los escenarios de una ejecución
+class LoadContext:
+    def __init__(self, users: int, engine, seed: int = 42):
+        self.users = users
+        self.engine = engine
+        self.rng = random.Random(seed)
+        self.created = 0
+        self.deletable = []
+
+    def random_user_id(self) -> int:
+        return self.rng.randint(1, self.users)
+
+    # Ids de los usuarios creados por el escenario de alta, para borrarlos después
+    def load_created_ids(self):
+        with self.engine.connect() as conn:
+            self.deletable = list(conn.scalars(
+                select(UserDB.id).where(UserDB.username.like(f"{NEW_USER_PREFIX}%")).order_by(UserDB.id)
+            ))
+
+
+async def login(client, ctx, i):
+    username = seed_username(ctx.random_user_id())
+    return await client.post("/token", data={"username": username, "password": PASSWORD})
+
+async def welcome(client, ctx, i):
+    return await client.get("/users/me")
+
+async def directory(client, ctx, i):
+    return await client.get("/users/me/show")
+
+async def read_user(client, ctx, i):
+    return await client.get(f"/users/me/{ctx.random_user_id()}")
+
+async def update_user(client, ctx, i):
+    user_id = ctx.random_user_id()
+    return await client.put(f"/users/me/{user_id}", json={
+        "username": seed_username(user_id), "first_name": "Bench", "last_name": f"Update {i}",
+        "current_password": PASSWORD,
+    })
+
+async def create_user(client, ctx, i):
+    ctx.created += 1
+    return await client.post("/users/me/create", json={
+        "user": {"username": f"{NEW_USER_PREFIX}{ctx.created}@example.com", "hashed_password": PASSWORD},
+        "user_details": {"first_name": "Bench", "last_name": "Create"},
+    })
+
+async def delete_user(client, ctx, i):
+    return await client.delete(f"/users/me/{ctx.deletable.pop()}")
+
+
+# Orden de ejecución: las altas van antes que las bajas, que borran lo creado
+SCENARIOS = {
+    "POST /token": login,
+    "GET /users/me": welcome,
+    "GET /users/me/show": directory,
+    "GET /users/me/{user_id}": read_user,
+    "PUT /users/me/{user_id}": update_user,
+    "POST /users/me/create": create_user,
+    "DELETE /users/me/{user_id}": delete_user,
+}
+READ_ONLY = ("GET /users/me", "GET /users/me/show", "GET /users/me/{user_id}")
+
+
+# `requests` peticiones repartidas entre `concurrency` clientes que comparten el event loop
+async def run_scenario(client, ctx, fn, requests: int, concurrency: int) -> dict:
+    timings = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in pending:
+            start = time.perf_counter()
+            response = await fn(client, ctx, i)
+            timings.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        **summarize(timings),
+        "errors": errors,
+        "throughput_rps": round(len(timings) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+# Ejecuta la aplicación en proceso (con su lifespan) y recorre los escenarios
+# para cada nivel de concurrencia. Devuelve {escenario: {concurrencia: resumen}}.
+async def run_load(app, ctx, scenarios: list, concurrency_levels: list, requests: int, warmup: int) -> dict:
+    from database import dispose_engine
+
+    results = {name: {} for name in scenarios}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="https://testserver") as client:
+            # Sesión para las rutas protegidas (la cookie queda en el cliente)
+            response = await client.post("/token", data={"username": seed_username(1), "password": PASSWORD})
+            response.raise_for_status()
+
+            for name in scenarios:
+                if name in READ_ONLY:
+                    await run_scenario(client, ctx, SCENARIOS[name], warmup, 1)
+
+            for concurrency in concurrency_levels:
+                for name in scenarios:
+                    count = requests
+                    if name == "DELETE /users/me/{user_id}":
+                        ctx.load_created_ids()
+                        count = min(requests, len(ctx.deletable))
+                    results[name][str(concurrency)] = await run_scenario(
+                        client, ctx, SCENARIOS[name], count, concurrency
+                    )
+    # Con aiosqlite cada conexión abierta es un hilo que impide terminar el proceso
+    await dispose_engine()
+    return results
@@ -0,0 +1,61 @@
+import time
+from types import SimpleNamespace
+
+from markupsafe import Markup
+
+from benchmarks.common import summarize
+
+
+def bench(fn, iterations: int, *args) -> dict:
+    fn(*args)  # calentamiento
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+# Filas con la misma forma que las de list_users_page para renderizar el directorio
+def directory_rows(count: int) -> list:
+    return [
+        {
+            "user": SimpleNamespace(id=i, username=f"user{i}@example.com"),
+            "details": SimpleNamespace(user_id=i, first_name="Ana", last_name="García", dob="1990-01-01",
+                                       location="Lima", bio="Desarrolladora"),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+# Funciones aisladas del camino de autenticación y del renderizado de plantillas.
+# bcrypt es varios órdenes de magnitud más lento que el resto, por eso tiene
+# su propio número de iteraciones.
+def run_micro(iterations: int, hash_iterations: int, page_size: int, bcrypt_rounds: int) -> dict:
+    import main
+    from auth import create_access_token, is_session_expired
+    from benchmarks.load import PASSWORD
+    from hashing import build_crypt_context
+
+    context = build_crypt_context(bcrypt_rounds)
+    hashed = context.hash(PASSWORD)
+    now = time.time()
+    rows = directory_rows(page_size)
+    page = {"items": rows, "page_size": page_size, "next_cursor": page_size, "prev_cursor": None}
+    show = main.get_templates().get_template("show.html")
+    table = main.get_templates().get_template("_directory_table.html")
+    welcome = main.get_templates().get_template("welcome.html")
+    cached_table = Markup(table.render(all_users_with_details=rows, page=page))
+
+    return {
+        "verify_password": bench(context.verify, hash_iterations, PASSWORD, hashed),
+        "create_access_token": bench(create_access_token, iterations, {"sub": "user1@example.com"}),
+        "is_session_expired": bench(is_session_expired, iterations, now),
+        "render welcome.html": bench(welcome.render, iterations, {"username": "Ana García"}),
+        f"render _directory_table.html ({page_size} filas)": bench(table.render, iterations, {
+            "all_users_with_details": rows, "page": page,
+        }),
+        "render show.html (tabla en caché)": bench(show.render, iterations, {
+            "username": "Ana García", "directory_table": cached_table,
+        }),
+    }
@@ -0,0 +1,176 @@
+import codecs
+import csv
+import io
+import json
+import time
+from itertools import islice
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError, field_validator
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from crud import find_existing_usernames, insert_user_batch
+
+
+# Fila del archivo de importación
+class BulkUserRow(BaseModel):
+    username: str
+    password: str
+    first_name: str
+    last_name: str
+    dob: Optional[str] = None
+    location: Optional[str] = None
+    bio: Optional[str] = None
+
+    @field_validator("username", "password", "first_name", "last_name")
+    @classmethod
+    def not_blank(cls, value: str):
+        if not value.strip():
+            raise ValueError("no puede estar vacío")
+        return value
+
+
+# Formato del archivo: parámetro explícito o extensión del nombre
+def detect_format(filename: str, fmt: str = None) -> str:
+    if fmt:
+        return fmt
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+class InvalidEncoding(ValueError):
+    pass
+
+
+# Comprueba que todo el archivo sea UTF-8 antes de importar nada: un error de
+# decodificación a mitad del archivo dejaría los lotes anteriores ya insertados
+def check_utf8(file, chunk_size: int = 1024 * 1024):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    offset = 0
+    try:
+        while chunk := file.read(chunk_size):
+            decoder.decode(chunk)
+            offset += len(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError as exc:
+        raise InvalidEncoding(f"El archivo no está en UTF-8 (byte {offset + exc.start})")
+    finally:
+        file.seek(0)
+
+# Recorre el archivo fila a fila devolviendo (número de fila, dict o error)
+def iter_rows(file, fmt: str):
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == "ndjson":
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield number, f"JSON inválido: {exc.msg}"
+                continue
+            if not isinstance(data, dict):
+                yield number, "Se esperaba un objeto JSON"
+                continue
+            yield number, data
+    else:
+        reader = csv.DictReader(text)
+        # La fila 1 es la cabecera; las columnas de más quedan bajo la clave None
+        for number, row in enumerate(reader, start=2):
+            if None in row:
+                yield number, "La fila tiene más columnas que la cabecera"
+                continue
+            yield number, {key: value for key, value in row.items() if value != ""}
+
+
+def _error(number, username, message):
+    return {"row": number, "username": None if username is None else str(username), "error": message}
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+
+
+# Importación por lotes: lectura -> validación -> duplicados (un IN por lote)
+# -> hashes en paralelo en el pool de bcrypt -> INSERT de varias filas.
+async def import_users(file, fmt: str, db, hasher, batch_size: int, hash_concurrency: int = None):
+    started = time.perf_counter()
+    timings = {"hash_seconds": 0.0, "insert_seconds": 0.0}
+    created = []
+    errors = []
+    total = 0
+
+    await run_in_threadpool(check_utf8, file)
+    rows = iter_rows(file, fmt)
+    while True:
+        batch = await run_in_threadpool(lambda: list(islice(rows, batch_size)))
+        if not batch:
+            break
+        total += len(batch)
+
+        # Validación y duplicados dentro del propio lote
+        valid = []
+        seen = set()
+        for number, data in batch:
+            if isinstance(data, str):
+                errors.append(_error(number, None, data))
+                continue
+            try:
+                row = BulkUserRow(**data)
+            except ValidationError as exc:
+                errors.append(_error(number, data.get("username"), _validation_message(exc)))
+                continue
+            except TypeError as exc:
+                errors.append(_error(number, data.get("username"), f"Fila inválida: {exc}"))
+                continue
+            if row.username in seen:
+                errors.append(_error(number, row.username, "Usuario repetido en el archivo"))
+                continue
+            seen.add(row.username)
+            valid.append((number, row))
+
+        # Duplicados contra la base de datos
+        existing = await db.run(find_existing_usernames, [row.username for _, row in valid])
+        pending = []
+        for number, row in valid:
+            if row.username in existing:
+                errors.append(_error(number, row.username, "Usuario ya existe"))
+            else:
+                pending.append((number, row))
+
+        hash_start = time.perf_counter()
+        hashes = await hasher.hash_many([row.password for _, row in pending], hash_concurrency)
+        timings["hash_seconds"] += time.perf_counter() - hash_start
+
+        to_insert = []
+        for (number, row), hashed in zip(pending, hashes):
+            if isinstance(hashed, Exception):
+                errors.append(_error(number, row.username, "No se pudo calcular el hash de la contraseña"))
+                continue
+            values = row.model_dump(exclude={"password"})
+            values["hashed_password"] = hashed
+            to_insert.append((number, values))
+
+        insert_start = time.perf_counter()
+        try:
+            ids = await db.run(insert_user_batch, [values for _, values in to_insert])
+            created.extend((values["username"], ids[values["username"]]) for _, values in to_insert)
+        except IntegrityError:
+            # Otro proceso creó alguno de estos usuarios entre la comprobación y el INSERT
+            errors.extend(_error(number, values["username"], "Conflicto al insertar el lote") for number, values in to_insert)
+        timings["insert_seconds"] += time.perf_counter() - insert_start
+
+    elapsed = time.perf_counter() - started
+    return {
+        "created": created,
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "stats": {
+            "rows": total,
+            "created": len(created),
+            "failed": len(errors),
+            "batch_size": batch_size,
+            "elapsed_seconds": elapsed,
+            "rows_per_second": total / elapsed if elapsed else 0.0,
+            **timings,
+        },
+    }
@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from crud import load_profile
+
+
+# Interfaz de backend de caché. La implementación por defecto vive en memoria
+# del proceso; para compartir la caché entre workers se puede implementar
+# esta misma interfaz sobre Redis/Memcached (los valores son dicts simples).
+class CacheBackend:
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+# Caché LRU con caducidad (TTL) en memoria del proceso
+class LRUCache(CacheBackend):
+    def __init__(self, max_entries: int = 1024, ttl: float = 60):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Caché de lectura de perfiles (usuario + detalles, sin la contraseña).
+# Cada perfil se guarda con dos claves: por id y por nombre de usuario.
+class ProfileCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    async def get_by_id(self, db, user_id: int):
+        return await self._get(db, f"user:id:{user_id}", user_id=user_id)
+
+    async def get_by_username(self, db, username: str):
+        return await self._get(db, f"user:name:{username}", username=username)
+
+    # Perfil ya cacheado, sin ir a la base de datos si no está
+    def cached_by_id(self, user_id: int):
+        return self.backend.get(f"user:id:{user_id}")
+
+    async def _get(self, db, key: str, **lookup):
+        profile = self.backend.get(key)
+        if profile is None:
+            profile = await db.run(load_profile, **lookup)
+            if profile is None:
+                return None
+            self.backend.set(f"user:id:{profile['id']}", profile)
+            self.backend.set(f"user:name:{profile['username']}", profile)
+        return profile
+
+    def invalidate(self, user_id: int = None, username: str = None):
+        if user_id is not None:
+            self.backend.delete(f"user:id:{user_id}")
+        if username is not None:
+            self.backend.delete(f"user:name:{username}")
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+# Acceso por atributos a un perfil cacheado (como si fueran las filas ORM)
+def profile_objects(profile: dict):
+    details = profile["details"]
+    user = SimpleNamespace(id=profile["id"], username=profile["username"])
+    return user, SimpleNamespace(**details) if details is not None else None
+
+
+# Fragmentos HTML de la tabla del directorio (filas + paginación), iguales para
+# todos los usuarios. Cada alta, cambio o baja incrementa `version` y vacía la
+# caché; un fragmento renderizado con datos leídos antes de ese cambio se
+# descarta al guardarlo. Las entradas se expulsan por LRU cuando su tamaño
+# total supera `max_bytes`. Como el contador es del proceso, los demás workers
+# ven el cambio cuando caduca el fragmento (`ttl`).
+class FragmentCache:
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = 0
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, html, size = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return html
+
+    # `version` es la que había antes de leer los datos del fragmento
+    def set(self, key, html: str, version: int):
+        size = len(html.encode())
+        with self._lock:
+            if version != self.version or size > self.max_bytes:
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + self.ttl, html, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        self._size -= self._data.pop(key)[2]
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+            self._data.clear()
+            self._size = 0
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
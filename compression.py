@@ -0,0 +1,136 @@
+import zlib
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+from metrics import HTTP_COMPRESSION_BYTES
+
+
+# Tipos que vale la pena comprimir. text/event-stream queda fuera: cada evento
+# debe llegar al momento y el compresor lo retendría.
+COMPRESSIBLE_TYPES = ("text/html", "text/css", "text/csv", "text/plain", "text/javascript",
+                      "application/json", "application/javascript", "application/x-ndjson", "image/svg+xml")
+# Codificaciones soportadas, en orden de preferencia, y su extensión en los assets precomprimidos
+ENCODINGS = ("br", "gzip")
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+# Mejor codificación aceptada por el cliente según Accept-Encoding (con valores q)
+def negotiate_encoding(accept_encoding: str):
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+# Compresor incremental con la misma interfaz para gzip y brotli
+class Encoder:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31 = cabecera gzip
+
+    # Comprime un fragmento y vacía el compresor para que el cliente lo reciba ya
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def is_compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return (
+        content_type in COMPRESSIBLE_TYPES
+        and "content-encoding" not in headers
+        and "no-transform" not in headers.get("cache-control", "")
+    )
+
+
+# Compresión gzip/brotli de las respuestas dinámicas (HTML del directorio, JSON,
+# exportaciones). Las respuestas menores que `minimum_size` se envían tal cual
+# y las que ya traen Content-Encoding (los assets precomprimidos) no se tocan.
+# Las respuestas en streaming se comprimen fragmento a fragmento.
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 gzip_level: int = COMPRESSION_GZIP_LEVEL, brotli_quality: int = COMPRESSION_BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Se retiene hasta ver el primer fragmento del cuerpo
+                start_message = message
+                passthrough = message["status"] in (204, 304) or not is_compressible(Headers(raw=message["headers"]))
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                encoder = Encoder(encoding, self.gzip_level, self.brotli_quality)
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                # El cuerpo comprimido es otra representación: el ETag pasa a ser débil
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                del headers["Content-Length"]
+
+            data = encoder.chunk(body) if more_body else encoder.finish(body)
+            HTTP_COMPRESSION_BYTES.inc(encoding, "in", amount=len(body))
+            HTTP_COMPRESSION_BYTES.inc(encoding, "out", amount=len(data))
+            if start_message is not None:
+                if not more_body:
+                    MutableHeaders(raw=start_message["headers"])["Content-Length"] = str(len(data))
+                await send(start_message)
+                start_message = None
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,110 @@
+import os
+
+from dotenv import load_dotenv
+
+
+# Cargar las variables de entorno desde el archivo .env
+load_dotenv()
+
+# Configuración de seguridad
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Réplicas de solo lectura (URLs separadas por comas) y cada cuántos segundos
+# se comprueba que respondan
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "10"))
+# Pool de conexiones de cada worker (cada réplica tiene uno igual). El lanzador
+# de producción (serve.py) calcula DB_POOL_SIZE y DB_MAX_OVERFLOW repartiendo
+# DB_MAX_CONNECTIONS entre los workers (0 = sin presupuesto global)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+# Workers de uvicorn que arranca serve.py (0 = uno por núcleo disponible)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+# Pool de hilos para bcrypt y tamaño máximo de la cola de espera
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "32"))
+# Tamaño de página por defecto y máximo para los listados de usuarios
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "50"))
+USERS_MAX_PAGE_SIZE = int(os.getenv("USERS_MAX_PAGE_SIZE", "500"))
+# Caché de perfiles: número máximo de entradas y segundos de vida
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+# Caché de la tabla del directorio ya renderizada: memoria máxima (bytes) y
+# segundos de vida (acota lo que tarda en verse un cambio hecho en otro worker)
+DIRECTORY_CACHE_MAX_BYTES = int(os.getenv("DIRECTORY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+DIRECTORY_CACHE_TTL = float(os.getenv("DIRECTORY_CACHE_TTL", "30"))
+# Sesión: minutos de inactividad permitidos y fracción de esa ventana que debe
+# pasar antes de volver a firmar el token (0 = renovar en cada petición)
+SESSION_INACTIVITY_MINUTES = int(os.getenv("SESSION_INACTIVITY_MINUTES", "30"))
+# Vida de cada token y de las revocaciones de sesión (misma ventana para las dos)
+SESSION_WINDOW_SECONDS = SESSION_INACTIVITY_MINUTES * 60
+SESSION_REFRESH_RATIO = float(os.getenv("SESSION_REFRESH_RATIO", "0.25"))
+# Número de tokens ya verificados que se guardan para no decodificarlos otra vez
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+# Límite de intentos de contraseña por IP y por usuario dentro de la ventana (segundos)
+LOGIN_LIMIT_PER_IP = int(os.getenv("LOGIN_LIMIT_PER_IP", "20"))
+LOGIN_LIMIT_PER_USERNAME = int(os.getenv("LOGIN_LIMIT_PER_USERNAME", "5"))
+LOGIN_LIMIT_WINDOW = float(os.getenv("LOGIN_LIMIT_WINDOW", "60"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Coste de bcrypt: BCRYPT_ROUNDS fija las rondas; si no se define, se calibran
+# al arrancar para que un hash tarde como máximo BCRYPT_TARGET_MS
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS")) if os.getenv("BCRYPT_ROUNDS") else None
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+# Filas leídas por lote en la exportación de usuarios
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Importación masiva: filas por lote y hashes calculados a la vez
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_HASH_CONCURRENCY = int(os.getenv("BULK_HASH_CONCURRENCY", HASH_WORKERS))
+# Actualización y borrado por lotes (/users/batch): usuarios por sentencia y máximo por petición
+USERS_BATCH_CHUNK_SIZE = int(os.getenv("USERS_BATCH_CHUNK_SIZE", "500"))
+USERS_BATCH_MAX_ITEMS = int(os.getenv("USERS_BATCH_MAX_ITEMS", "10000"))
+# Motor de búsqueda de usuarios: "like" (índices B-tree) o "fts" (SQLite FTS5 / MySQL FULLTEXT)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "like")
+# Revocación de sesiones: cada cuántos segundos se leen las revocaciones de los
+# demás workers y tamaño (segundos) de los grupos en que se caducan en memoria
+REVOCATION_POLL_SECONDS = float(os.getenv("REVOCATION_POLL_SECONDS", "5"))
+REVOCATION_BUCKET_SECONDS = int(os.getenv("REVOCATION_BUCKET_SECONDS", "60"))
+# Compresión de respuestas: tamaño mínimo (bytes), nivel de gzip y calidad de
+# brotli para las respuestas dinámicas (los assets se comprimen al máximo al construirlos)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Control de admisión por clase de ruta. ADMISSION_LIMITS cambia los valores por
+# defecto de admission.py con el formato "clase=concurrencia/cola/espera_ms,..."
+# (por ejemplo "listing=4/8/100,bulk=1/2/500")
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", "")
+# Eventos del directorio (/users/events): mensajes pendientes por cliente (si se
+# llena, se le desconecta y recarga la tabla), máximo de clientes conectados,
+# eventos guardados para reanudar con Last-Event-ID, segundos entre latidos y
+# duración máxima de cada conexión (el navegador se reconecta solo)
+EVENTS_CLIENT_BUFFER = int(os.getenv("EVENTS_CLIENT_BUFFER", "64"))
+EVENTS_MAX_CLIENTS = int(os.getenv("EVENTS_MAX_CLIENTS", "1000"))
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "256"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", "300"))
+# Crear las tablas al arrancar la aplicación (desarrollo). En producción el
+# esquema se crea con `python manage.py create-schema`.
+CREATE_SCHEMA_ON_STARTUP = os.getenv("CREATE_SCHEMA_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+# Abrir las conexiones del pool y compilar las plantillas antes de aceptar
+# peticiones (serve.py lo activa en producción)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+# Orígenes permitidos por CORS, separados por comas
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "http://127.0.0.1:5500").split(",") if o.strip()]
+
+
+# Opciones de una instancia de la aplicación (create_app); por defecto, las del entorno
+class Settings:
+    def __init__(self, database_url: str = None, create_schema: bool = None, cors_origins: list = None,
+                 replica_urls: list = None, warmup: bool = None):
+        self.database_url = database_url or DATABASE_URL
+        self.replica_urls = DATABASE_REPLICA_URLS if replica_urls is None else replica_urls
+        self.create_schema = CREATE_SCHEMA_ON_STARTUP if create_schema is None else create_schema
+        self.cors_origins = CORS_ORIGINS if cors_origins is None else cors_origins
+        self.warmup = WARMUP_ON_STARTUP if warmup is None else warmup
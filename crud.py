@@ -0,0 +1,124 @@
+from sqlalchemy import insert, select
+
+from etag import row_version
+from models import UserDB, UserDetailsDB, utcnow
+
+
+# Funciones de acceso a datos. Son síncronas y reciben la sesión como primer
+# argumento para poder ejecutarlas con `await db.run(fn, ...)` en ambos modos.
+
+# Campos editables de user_details
+DETAIL_FIELDS = ("first_name", "last_name", "dob", "location", "bio")
+
+# Usuario y detalles en una sola consulta
+def get_user_with_details(db, username: str):
+    return (
+        db.query(UserDB, UserDetailsDB)
+        .outerjoin(UserDB.user_details)
+        .filter(UserDB.username == username)
+        .first()
+    )
+
+def get_user_by_username(db, username: str):
+    return db.query(UserDB).filter(UserDB.username == username).first()
+
+def get_user_by_id(db, user_id: int):
+    return db.query(UserDB).filter(UserDB.id == user_id).first()
+
+# Función para obtener los detalles del usuario
+def get_user_details(db, user_id: int):
+    return db.query(UserDetailsDB).filter(UserDetailsDB.user_id == user_id).first()
+
+# Versión de los detalles de un usuario (para validar ETags sin cargar la fila)
+def get_details_version(db, user_id: int):
+    row = db.execute(
+        select(UserDetailsDB.version, UserDetailsDB.updated_at).where(UserDetailsDB.user_id == user_id)
+    ).first()
+    return None if row is None else row_version(*row)
+
+# Perfil como dict simple (sin contraseña) para poder cachearlo
+def load_profile(db, user_id: int = None, username: str = None):
+    query = db.query(UserDB, UserDetailsDB).outerjoin(UserDB.user_details)
+    if user_id is not None:
+        query = query.filter(UserDB.id == user_id)
+    else:
+        query = query.filter(UserDB.username == username)
+    row = query.first()
+    if row is None:
+        return None
+
+    user, details = row
+    return {
+        "id": user.id,
+        "username": user.username,
+        "version": None if details is None else row_version(details.version, details.updated_at),
+        "details": None if details is None else {
+            "user_id": details.user_id,
+            **{field: getattr(details, field) for field in DETAIL_FIELDS},
+        },
+    }
+
+def create_user_with_details(db, username: str, hashed_password: str, details: dict):
+    new_user = UserDB(username=username, hashed_password=hashed_password)
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+
+    new_user_details = UserDetailsDB(user_id=new_user.id, **details)
+    db.add(new_user_details)
+    db.commit()
+    db.refresh(new_user_details)
+    return new_user.id
+
+# Actualiza los detalles (y opcionalmente la contraseña) de un usuario ya cargado
+def update_user_with_details(db, user: UserDB, details: dict, hashed_password: str = None, user_details: UserDetailsDB = None):
+    if hashed_password:
+        user.hashed_password = hashed_password
+
+    if user_details is None:
+        user_details = get_user_details(db, user.id)
+    if user_details:
+        for field, value in details.items():
+            setattr(user_details, field, value)
+
+    db.commit()
+    return user_details
+
+# Nombres de usuario que ya existen, en una sola consulta IN por lote
+def find_existing_usernames(db, usernames: list):
+    if not usernames:
+        return set()
+    rows = db.execute(select(UserDB.username).where(UserDB.username.in_(usernames)))
+    return {username for (username,) in rows}
+
+# Inserta un lote de usuarios con sus detalles usando INSERT de varias filas
+# (uno para users y otro para user_details) en una sola transacción.
+# Cada fila es un dict con username, hashed_password y los campos de DETAIL_FIELDS.
+def insert_user_batch(db, rows: list):
+    if not rows:
+        return {}
+    try:
+        db.execute(insert(UserDB).values([
+            {"username": row["username"], "hashed_password": row["hashed_password"]} for row in rows
+        ]))
+        usernames = [row["username"] for row in rows]
+        ids = dict(db.execute(select(UserDB.username, UserDB.id).where(UserDB.username.in_(usernames))).all())
+        now = utcnow()
+        db.execute(insert(UserDetailsDB).values([
+            {"user_id": ids[row["username"]], "updated_at": now, **{field: row.get(field) for field in DETAIL_FIELDS}}
+            for row in rows
+        ]))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return ids
+
+def update_password_hash(db, username: str, hashed_password: str):
+    db.query(UserDB).filter(UserDB.username == username).update({"hashed_password": hashed_password})
+    db.commit()
+
+def delete_user_by_id(db, user_id: int):
+    db.query(UserDetailsDB).filter(UserDetailsDB.user_id == user_id).delete()
+    db.query(UserDB).filter(UserDB.id == user_id).delete()
+    db.commit()
@@ -0,0 +1,383 @@
+import asyncio
+import logging
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from config import (
+    DATABASE_URL, DATABASE_REPLICA_URLS, REPLICA_CHECK_SECONDS, SEARCH_BACKEND,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+)
+from models import Base
+from search import get_search_backend
+from metrics import instrument_engine
+
+
+logger = logging.getLogger(__name__)
+
+# Drivers asíncronos: si DATABASE_URL usa uno de ellos se activa el modo async
+# (por ejemplo sqlite+aiosqlite:///./app.db o mysql+aiomysql://...)
+ASYNC_DRIVERS = {"aiosqlite", "aiomysql", "asyncmy", "asyncpg"}
+
+def is_async_url(url: str) -> bool:
+    return make_url(url).get_driver_name() in ASYNC_DRIVERS
+
+# Configuración de la base de datos (por worker: con varios workers el total
+# de conexiones es workers * (pool_size + max_overflow), ver serve.py)
+engine_options = dict(
+    pool_size=DB_POOL_SIZE,          # Conexiones que se mantienen abiertas
+    max_overflow=DB_MAX_OVERFLOW,    # Conexiones adicionales en los picos
+    pool_timeout=DB_POOL_TIMEOUT,    # Tiempo de espera antes de lanzar TimeoutError
+    pool_recycle=DB_POOL_RECYCLE     # Recicla conexiones cada 30 minutos para evitar problemas
+)
+
+# Engine y fábrica de sesiones para una URL (síncrona o async según el driver)
+def build_engine(url: str):
+    if is_async_url(url):
+        engine = create_async_engine(url, **engine_options)
+        # expire_on_commit=False: tras un commit no se puede hacer lazy load fuera del greenlet
+        return engine, async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    engine = create_engine(url, **engine_options)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# El engine se crea con el primer uso (normalmente en el lifespan de la app),
+# no al importar: importar la aplicación, un script o un benchmark no abre
+# conexiones. create_app puede cambiar la URL antes con configure().
+_database_url = DATABASE_URL
+_replica_urls = DATABASE_REPLICA_URLS
+_engine = None
+_session_factory = None
+_replicas = None
+_search_backend = None
+
+def configure(database_url: str, replica_urls: list = ()):
+    global _database_url, _replica_urls, _search_backend
+    if _engine is not None and database_url != _database_url:
+        raise RuntimeError("El engine ya está creado con otra DATABASE_URL")
+    # DBSession y la exportación eligen el modo (run_sync o threadpool) según la primaria
+    if any(is_async_url(url) != is_async_url(database_url) for url in replica_urls):
+        raise ValueError("Las réplicas deben usar un driver del mismo tipo (síncrono o async) que DATABASE_URL")
+    _database_url = database_url
+    _replica_urls = list(replica_urls)
+    _search_backend = None
+
+def is_async() -> bool:
+    return is_async_url(_database_url)
+
+def get_engine():
+    global _engine, _session_factory
+    if _engine is None:
+        _engine, _session_factory = build_engine(_database_url)
+        register_engine_events(get_sync_engine())
+    return _engine
+
+# Los eventos del pool y de las consultas se registran sobre el engine síncrono
+# (en modo async, el subyacente)
+def get_sync_engine():
+    engine = get_engine()
+    return engine.sync_engine if is_async() else engine
+
+def new_session():
+    get_engine()
+    return _session_factory()
+
+# Réplicas configuradas (None si no hay DATABASE_REPLICA_URLS)
+def get_replicas():
+    global _replicas
+    if _replicas is None and _replica_urls:
+        _replicas = ReplicaSet(_replica_urls, REPLICA_CHECK_SECONDS)
+    return _replicas
+
+# Sesión para lecturas largas fuera de una petición (la exportación): en una
+# réplica sana si las hay, si no en la primaria
+def new_read_session():
+    replicas = get_replicas()
+    replica = replicas.choose() if replicas else None
+    return replica.session_factory() if replica else new_session()
+
+# Abre `connections` conexiones (por defecto pool_size) y las devuelve al
+# pool, así las primeras peticiones no pagan la conexión (TCP, TLS, login)
+async def warm_pool(connections: int = None) -> int:
+    engine = get_engine()
+    count = engine_options["pool_size"] if connections is None else connections
+    if isinstance(engine, AsyncEngine):
+        opened = [await engine.connect() for _ in range(count)]
+        for connection in opened:
+            await connection.close()
+    else:
+        def open_and_release():
+            opened = [engine.connect() for _ in range(count)]
+            for connection in opened:
+                connection.close()
+        await run_in_threadpool(open_and_release)
+    return count
+
+async def _dispose(engine):
+    if isinstance(engine, AsyncEngine):
+        await engine.dispose()
+    else:
+        await run_in_threadpool(engine.dispose)
+
+async def dispose_engine():
+    global _engine, _session_factory, _replicas
+    if _replicas is not None:
+        await _replicas.stop()
+        for replica in _replicas.replicas:
+            await _dispose(replica.engine)
+        _replicas = None
+    if _engine is None:
+        return
+    await _dispose(_engine)
+    _engine = None
+    _session_factory = None
+
+# Backend de búsqueda según SEARCH_BACKEND y el motor de la URL (sin conectar)
+def current_search_backend():
+    global _search_backend
+    if _search_backend is None:
+        _search_backend = get_search_backend(SEARCH_BACKEND, make_url(_database_url).get_backend_name())
+    return _search_backend
+
+
+# Réplica de solo lectura. `healthy` lo actualiza la comprobación periódica y
+# lo baja DBSession.read si una consulta falla por la conexión.
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine, self.session_factory = build_engine(url)
+        instrument_engine(self.engine.sync_engine if isinstance(self.engine, AsyncEngine) else self.engine)
+        self.healthy = True
+        self.reads = 0
+        self.failures = 0
+
+    def _ping(self):
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    async def ping(self) -> bool:
+        try:
+            if isinstance(self.engine, AsyncEngine):
+                async with self.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            else:
+                await run_in_threadpool(self._ping)
+        except Exception as exc:
+            logger.warning("Réplica %s no disponible: %s", self.name, exc)
+            return False
+        return True
+
+
+# Conjunto de réplicas: reparte las lecturas en round-robin entre las sanas y
+# cada `check_seconds` vuelve a comprobarlas todas (también las caídas, para
+# devolverlas al reparto cuando se recuperan)
+class ReplicaSet:
+    def __init__(self, urls: list, check_seconds: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.check_seconds = check_seconds
+        self._counter = 0
+        self._task = None
+        self.fallbacks = 0
+
+    def choose(self):
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        self._counter += 1
+        return healthy[self._counter % len(healthy)]
+
+    def mark_down(self, replica: Replica):
+        replica.healthy = False
+        replica.failures += 1
+
+    async def check(self):
+        for replica in self.replicas:
+            replica.healthy = await replica.ping()
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.check_seconds)
+            await self.check()
+
+    async def start(self):
+        await self.check()
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "fallbacks": self.fallbacks,
+            "replicas": [
+                {"name": r.name, "healthy": r.healthy, "reads": r.reads, "failures": r.failures}
+                for r in self.replicas
+            ],
+        }
+
+
+# Una petición que ya escribió en la primaria lee de la primaria (lectura de lo
+# recién escrito). Se marca con cualquier INSERT/UPDATE/DELETE: los de Core y
+# query.update()/delete() pasan por do_orm_execute; los del ORM, por el flush.
+@event.listens_for(Session, "do_orm_execute")
+def _mark_write_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(Session, "after_flush")
+def _mark_write_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+async def _run_on(session, fn, *args, **kwargs):
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, session, *args, **kwargs)
+
+async def _close(session):
+    if isinstance(session, AsyncSession):
+        await session.close()
+    else:
+        await run_in_threadpool(session.close)
+
+
+# Sesión que se usa igual en los dos modos: las consultas se escriben como
+# funciones síncronas `fn(session, ...)` y las rutas las esperan con `await db.run(...)`.
+# En modo async se ejecutan con AsyncSession.run_sync (la E/S no bloquea el event loop);
+# en modo síncrono se ejecutan en el threadpool de Starlette.
+# `db.run` usa siempre la primaria; `db.read` es para consultas de solo lectura
+# que pueden ir a una réplica.
+class DBSession:
+    def __init__(self, session, replicas: ReplicaSet = None):
+        self.session = session
+        self.replicas = replicas
+        self._replica = None
+        self._reader = None
+
+    async def run(self, fn, *args, **kwargs):
+        return await _run_on(self.session, fn, *args, **kwargs)
+
+    # Lectura en una réplica (la misma durante toda la petición). Va a la primaria
+    # si no hay réplicas sanas o si la petición ya escribió. Si la réplica falla
+    # por la conexión se saca del reparto y la consulta se repite en la primaria.
+    async def read(self, fn, *args, **kwargs):
+        if self.replicas is None or self.session.info.get("wrote"):
+            return await self.run(fn, *args, **kwargs)
+        if self._reader is None:
+            self._replica = self.replicas.choose()
+            if self._replica is None:
+                return await self.run(fn, *args, **kwargs)
+            self._reader = self._replica.session_factory()
+        try:
+            result = await _run_on(self._reader, fn, *args, **kwargs)
+        except (OperationalError, InterfaceError):
+            logger.warning("Lectura fallida en la réplica %s, se usa la primaria", self._replica.name, exc_info=True)
+            self.replicas.mark_down(self._replica)
+            self.replicas.fallbacks += 1
+            await self._close_reader()
+            return await self.run(fn, *args, **kwargs)
+        self._replica.reads += 1
+        return result
+
+    async def _close_reader(self):
+        reader, self._reader, self._replica = self._reader, None, None
+        try:
+            await _close(reader)
+        except Exception:
+            logger.debug("Error al cerrar la sesión de la réplica", exc_info=True)
+
+    async def close(self):
+        if self._reader is not None:
+            await self._close_reader()
+        await _close(self.session)
+
+# Sesión por petición: se cierra siempre, aunque la ruta lance una excepción
+async def get_db():
+    db = DBSession(new_session(), get_replicas())
+    try:
+        yield db
+    finally:
+        await db.close()
+
+# Crea las tablas que falten y añade a las existentes las columnas e índices
+# nuevos del modelo (solo cambios aditivos; create_all no altera tablas ya creadas)
+def sync_schema(connection):
+    Base.metadata.create_all(bind=connection)
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=connection.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                # Las filas existentes toman el valor por defecto del servidor
+                if column.server_default is not None:
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                connection.exec_driver_sql(ddl)
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(bind=connection)
+    current_search_backend().install(connection)
+
+# Crear todas las tablas en la base de datos
+async def create_schema():
+    engine = get_engine()
+    if is_async():
+        async with engine.begin() as conn:
+            await conn.run_sync(sync_schema)
+    else:
+        def run():
+            with engine.begin() as conn:
+                sync_schema(conn)
+        await run_in_threadpool(run)
+
+
+# Contadores del pool para detectar fugas de conexiones
+# (si checkouts crece más rápido que checkins, alguna sesión no se cierra)
+pool_counters = {"connects": 0, "checkouts": 0, "checkins": 0}
+
+def _on_connect(dbapi_connection, connection_record):
+    pool_counters["connects"] += 1
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_counters["checkouts"] += 1
+
+def _on_checkin(dbapi_connection, connection_record):
+    pool_counters["checkins"] += 1
+
+# SQLite solo aplica las claves foráneas (y ON DELETE CASCADE) si se activan en cada conexión
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def register_engine_events(sync_engine):
+    event.listen(sync_engine, "connect", _on_connect)
+    event.listen(sync_engine, "checkout", _on_checkout)
+    event.listen(sync_engine, "checkin", _on_checkin)
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _enable_sqlite_foreign_keys)
+    # Número y duración de las consultas SQL (por petición y en total)
+    instrument_engine(sync_engine)
+
+def get_pool_stats():
+    stats = dict(pool_counters, mode="async" if is_async() else "sync")
+    if _engine is None:
+        return stats
+    pool = get_sync_engine().pool
+    for name in ("size", "checkedout", "checkedin", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[name] = method()
+    if _replicas is not None:
+        stats["replicas"] = _replicas.stats()
+    return stats
@@ -0,0 +1,41 @@
+import hashlib
+
+from fastapi import Response
+
+
+# ETags fuertes a partir de la versión de las filas (user_details.version).
+# Con If-None-Match basta con consultar la versión para responder 304,
+# sin cargar ni serializar la fila.
+
+# Versión de una fila para el ETag: el contador y updated_at. El contador solo
+# no basta: si se borra un usuario y su id se reutiliza, la fila nueva empieza
+# otra vez en la versión 1.
+def row_version(version, updated_at) -> str:
+    stamp = updated_at.strftime("%Y%m%d%H%M%S%f") if updated_at is not None else "0"
+    return f"{version}.{stamp}"
+
+# ETag de un recurso con una sola fila
+def version_etag(kind: str, key, version) -> str:
+    return f'"{kind}-{key}-v{version}"'
+
+# ETag de una lista a partir de los pares (id, versión) de sus filas, en orden
+def rows_etag(pairs) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for key, version in pairs:
+        digest.update(f"{key}:{version};".encode())
+    return f'"{digest.hexdigest()}"'
+
+# Comparación débil de If-None-Match (RFC 9110): admite listas, `*` y W/
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+# El navegador puede guardar la respuesta pero debe revalidarla en cada uso
+def set_etag(response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def not_modified(etag: str):
+    return set_etag(Response(status_code=304), etag)
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+import orjson
+
+from crud import DETAIL_FIELDS
+
+
+logger = logging.getLogger(__name__)
+
+# Eventos del directorio de usuarios enviados por Server-Sent Events. Las rutas
+# que escriben publican cambios por fila y las páginas del directorio los
+# aplican sobre la tabla, sin volver a pedir (ni renderizar) la página entera:
+#   created  {"users": [{"id", "username", first_name, ...}]}
+#   updated  {"users": [{"id", <solo los campos cambiados>}]}
+#   deleted  {"ids": [...]}
+#   reset    el cliente perdió eventos (o son demasiados cambios): recarga la tabla
+
+# Más filas que esto en un solo cambio se publican como "reset"
+MAX_EVENT_ROWS = 500
+# Espera antes de reconectar que se indica al navegador (ms)
+RETRY_MS = 3000
+HEARTBEAT = b": ping\n\n"
+RESET = b"event: reset\ndata: {}\n\n"
+
+
+def user_row(user_id: int, details: dict, username: str = None) -> dict:
+    row = {"id": user_id, **{field: details[field] for field in DETAIL_FIELDS if field in details}}
+    if username is not None:
+        row["username"] = username
+    return row
+
+
+# Interfaz del transporte de eventos. La versión en memoria entrega los eventos
+# solo a los clientes de este proceso; un backend compartido (p. ej. Redis
+# pub/sub o LISTEN/NOTIFY de PostgreSQL) publica en un canal y llama a
+# `deliver` con cada evento recibido, incluidos los de este mismo worker.
+class EventBackend:
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, event: dict):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class MemoryEventBackend(EventBackend):
+    def __init__(self):
+        self._deliver = None
+
+    async def publish(self, event: dict):
+        if self._deliver is not None:
+            self._deliver(event)
+
+
+class TooManyClients(Exception):
+    pass
+
+
+# Cliente conectado: cola acotada de eventos ya formateados. None la cierra.
+class Subscriber:
+    def __init__(self, buffer_size: int):
+        self.queue = asyncio.Queue(maxsize=max(2, buffer_size))
+        self.closed = False
+        # Id con el que empieza la conexión: así el navegador sabe desde dónde
+        # reanudar aunque se desconecte antes de recibir ningún evento
+        self.start_id = None
+
+    def close(self, last_frame: bytes = None):
+        if self.closed:
+            return
+        self.closed = True
+        # Se vacía la cola para que quepan el último mensaje y el cierre
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if last_frame is not None:
+            self.queue.put_nowait(last_frame)
+        self.queue.put_nowait(None)
+
+
+# Difusión de eventos a los clientes de /users/events. Cada evento se
+# serializa una sola vez y el mismo mensaje se encola en todos los clientes.
+# Un cliente lento cuya cola se llena se desconecta (recibe "reset" y al
+# reconectarse recarga la tabla) en lugar de retener memoria o frenar al resto.
+class EventHub:
+    def __init__(self, backend: EventBackend, buffer_size: int, max_clients: int, replay_size: int,
+                 heartbeat: float, max_stream: float):
+        self.backend = backend
+        self.buffer_size = buffer_size
+        self.max_clients = max_clients
+        self.heartbeat = heartbeat
+        self.max_stream = max_stream
+        # Los ids llevan un prefijo propio de este proceso: un Last-Event-ID de
+        # otro worker (o de antes de reiniciar) no se confunde con uno local
+        self._epoch = os.urandom(4).hex()
+        self._sequence = 0
+        self._replay = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    async def start(self):
+        await self.backend.start(self._deliver)
+
+    async def stop(self):
+        await self.backend.stop()
+        for subscriber in list(self._subscribers):
+            subscriber.close()
+        self._subscribers.clear()
+
+    # Un fallo al publicar no debe deshacer la escritura que ya se confirmó
+    async def publish(self, event_type: str, **data):
+        try:
+            await self.backend.publish({"type": event_type, **data})
+        except Exception:
+            logger.exception("No se pudo publicar el evento %s", event_type)
+
+    async def publish_rows(self, event_type: str, rows: list):
+        if not rows:
+            return
+        if len(rows) > MAX_EVENT_ROWS:
+            await self.publish("reset")
+        else:
+            await self.publish(event_type, users=rows)
+
+    def _event_id(self, sequence: int) -> str:
+        return f"{self._epoch}-{sequence}"
+
+    def _frame(self, event: dict) -> tuple:
+        self._sequence += 1
+        event_id = self._event_id(self._sequence)
+        data = {key: value for key, value in event.items() if key != "type"}
+        frame = b"id: %s\nevent: %s\ndata: %s\n\n" % (
+            event_id.encode(), event["type"].encode(), orjson.dumps(data)
+        )
+        return self._sequence, frame
+
+    def _deliver(self, event: dict):
+        sequence, frame = self._frame(event)
+        self._replay.append((sequence, frame))
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(frame)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        subscriber.close(RESET)
+        self.dropped += 1
+
+    # Eventos posteriores a `last_event_id` que siguen guardados, o None si no
+    # se pueden recuperar todos (id de otro proceso o demasiado antiguo)
+    def _missed(self, last_event_id: str):
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self._epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if sequence == self._sequence:
+            return []
+        if not self._replay or sequence > self._sequence or sequence + 1 < self._replay[0][0]:
+            return None
+        return [frame for number, frame in self._replay if number > sequence]
+
+    def subscribe(self, last_event_id: str = None) -> Subscriber:
+        if len(self._subscribers) >= self.max_clients:
+            self.rejected += 1
+            raise TooManyClients()
+        subscriber = Subscriber(self.buffer_size)
+        missed = self._missed(last_event_id) if last_event_id else []
+        if missed is None or len(missed) > subscriber.queue.maxsize - 1:
+            subscriber.queue.put_nowait(RESET)
+            subscriber.start_id = self._event_id(self._sequence)
+        elif missed:
+            for frame in missed:
+                subscriber.queue.put_nowait(frame)
+        else:
+            subscriber.start_id = self._event_id(self._sequence)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    # Cuerpo de la respuesta text/event-stream: eventos, un comentario de
+    # latido cada `heartbeat` segundos (mantiene viva la conexión en los
+    # proxies) y cierre tras `max_stream` segundos para que el navegador se
+    # reconecte (vuelve a validar la sesión y no bloquea el apagado del servidor)
+    async def stream(self, subscriber: Subscriber):
+        deadline = time.monotonic() + self.max_stream
+        try:
+            if subscriber.start_id is None:
+                yield b"retry: %d\n\n" % RETRY_MS
+            else:
+                yield b"retry: %d\nid: %s\n\n" % (RETRY_MS, subscriber.start_id.encode())
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), min(self.heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    frame = HEARTBEAT
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._subscribers),
+            "max_clients": self.max_clients,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from database import is_async, new_read_session
+from models import UserDB, UserDetailsDB
+
+
+# Columnas exportables (usuario + detalles)
+EXPORT_COLUMNS = {
+    "id": UserDB.id,
+    "username": UserDB.username,
+    "first_name": UserDetailsDB.first_name,
+    "last_name": UserDetailsDB.last_name,
+    "dob": UserDetailsDB.dob,
+    "location": UserDetailsDB.location,
+    "bio": UserDetailsDB.bio,
+    "updated_at": UserDetailsDB.updated_at,
+}
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def build_export_query(columns: list, updated_since: datetime = None, batch_size: int = 1000):
+    stmt = (
+        select(*(EXPORT_COLUMNS[name] for name in columns))
+        .select_from(UserDB)
+        .outerjoin(UserDB.user_details)
+        .order_by(UserDB.id)
+    )
+    if updated_since is not None:
+        # updated_at se guarda en UTC sin zona: una fecha con zona se pasa a UTC
+        if updated_since.tzinfo is not None:
+            updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+        stmt = stmt.where(UserDetailsDB.updated_at >= updated_since)
+    # Cursor del lado del servidor y lectura por lotes: memoria constante
+    return stmt.execution_options(stream_results=True, yield_per=batch_size)
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+# Convierte un lote de filas en un bloque de texto del formato pedido
+def format_batch(rows, columns: list, fmt: str) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({name: _value(value) for name, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+def format_header(columns: list, fmt: str) -> str:
+    if fmt == "ndjson":
+        return ""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue()
+
+
+# Generador de la exportación. Abre su propia sesión (en una réplica si las hay)
+# porque la sesión de la petición se cierra antes de que termine de enviarse la respuesta.
+# En modo síncrono es un generador normal (Starlette lo recorre en el threadpool);
+# en modo async usa AsyncSession.stream y no bloquea el event loop.
+def stream_users(columns: list, fmt: str, updated_since: datetime = None, batch_size: int = 1000):
+    stmt = build_export_query(columns, updated_since, batch_size)
+    header = format_header(columns, fmt)
+
+    if is_async():
+        async def generate_async():
+            if header:
+                yield header
+            async with new_read_session() as session:
+                result = await session.stream(stmt)
+                async for rows in result.partitions():
+                    yield format_batch(rows, columns, fmt)
+        return generate_async()
+
+    def generate():
+        if header:
+            yield header
+        with new_read_session() as session:
+            for rows in session.execute(stmt).partitions():
+                yield format_batch(rows, columns, fmt)
+    return generate()
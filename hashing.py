@@ -0,0 +1,178 @@
+import asyncio
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from metrics import BCRYPT_SECONDS
+
+
+# Contexto de passlib con la política de coste vigente. Los hashes con menos
+# rondas que la política se marcan para actualizar (needs_update); los que
+# tienen más rondas se dejan como están para no rebajar su seguridad.
+def build_crypt_context(rounds: int):
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+    )
+
+# Calibración del coste de bcrypt según el hardware: se mide el hash con
+# `min_rounds` y, como cada ronda extra duplica el tiempo, se elige el mayor
+# número de rondas cuyo tiempo estimado no supera el objetivo.
+def calibrate_bcrypt_rounds(target_seconds: float, min_rounds: int = 10, max_rounds: int = 16, samples: int = 3):
+    context = build_crypt_context(min_rounds)
+    context.hash("calibracion")  # calentamiento
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash("calibracion")
+        timings.append(time.perf_counter() - start)
+    base_seconds = min(timings)
+
+    rounds = min_rounds
+    while rounds < max_rounds and base_seconds * 2 ** (rounds + 1 - min_rounds) <= target_seconds:
+        rounds += 1
+
+    return {
+        "rounds": rounds,
+        "target_seconds": target_seconds,
+        "base_rounds": min_rounds,
+        "base_seconds": base_seconds,
+        "estimated_seconds": base_seconds * 2 ** (rounds - min_rounds),
+    }
+
+
+# Servicio asíncrono de hashing de contraseñas.
+# bcrypt libera el GIL, así que un pool de hilos dedicado permite calcular
+# varios hashes en paralelo sin bloquear el event loop de uvicorn.
+class PasswordHasher:
+    def __init__(self, pwd_context, workers: int = 4, queue_size: int = 32):
+        self.pwd_context = pwd_context
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        # Política de coste vigente y resultado de la última calibración
+        self.rounds = None
+        self.calibration = None
+        self.rehashes = 0
+        # Hash de referencia para verificar usuarios inexistentes
+        self._dummy_hash = None
+        # Tareas en ejecución + tareas esperando un hilo libre
+        self._pending = 0
+        self._rejected = 0
+        self._max_depth = 0
+        self._latency = {
+            "hash": {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+            "verify": {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+        }
+
+    # Número de tareas esperando un hilo (no incluye las que ya se están ejecutando)
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.workers)
+
+    def set_rounds(self, rounds: int, calibration: dict = None):
+        self.pwd_context = build_crypt_context(rounds)
+        self.rounds = rounds
+        self.calibration = calibration
+        self._dummy_hash = None
+
+    # Calibra en el pool de hashing (no bloquea el event loop) y aplica el resultado
+    async def calibrate(self, target_seconds: float, min_rounds: int, max_rounds: int) -> dict:
+        loop = asyncio.get_running_loop()
+        calibration = await loop.run_in_executor(
+            self._executor, calibrate_bcrypt_rounds, target_seconds, min_rounds, max_rounds
+        )
+        self.set_rounds(calibration["rounds"], calibration)
+        return calibration
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", self.pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", self.pwd_context.verify, plain_password, hashed_password)
+
+    # Hash de muchas contraseñas (importaciones masivas) con como máximo
+    # `concurrency` tareas a la vez, para no llenar la cola que usan los logins.
+    # Los errores (p. ej. 503 por saturación) se devuelven en su posición.
+    async def hash_many(self, passwords, concurrency: int = None):
+        semaphore = asyncio.Semaphore(concurrency or self.workers)
+
+        async def hash_one(password):
+            async with semaphore:
+                return await self.hash(password)
+
+        return await asyncio.gather(*(hash_one(p) for p in passwords), return_exceptions=True)
+
+    # Verifica y, si el hash no cumple la política actual, devuelve uno nuevo
+    # (en la misma tarea del pool). Devuelve (válida, nuevo_hash o None)
+    async def verify_and_update(self, plain_password: str, hashed_password: str):
+        valid, new_hash = await self._submit(
+            "verify", self.pwd_context.verify_and_update, plain_password, hashed_password
+        )
+        if new_hash:
+            self.rehashes += 1
+        return valid, new_hash
+
+    # Verificación de coste constante para usuarios que no existen: así el tiempo
+    # de respuesta no revela si el nombre de usuario está registrado
+    async def dummy_verify(self, plain_password: str) -> bool:
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash(secrets.token_urlsafe(16))
+        await self.verify(plain_password, self._dummy_hash)
+        return False
+
+    async def _submit(self, kind: str, fn, *args):
+        # Cola acotada: si está llena se responde 503 en lugar de acumular latencia
+        if self._pending >= self.workers + self.queue_size:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio de autenticación saturado, intente de nuevo",
+                headers={"Retry-After": "1"},
+            )
+
+        self._pending += 1
+        self._max_depth = max(self._max_depth, self.queue_depth)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            self._record(kind, time.perf_counter() - start)
+
+    def _record(self, kind: str, elapsed: float):
+        BCRYPT_SECONDS.observe(elapsed, kind)
+        stats = self._latency[kind]
+        stats["count"] += 1
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def stats(self) -> dict:
+        latency = {}
+        for kind, values in self._latency.items():
+            count = values["count"]
+            latency[kind] = {
+                **values,
+                "avg_seconds": values["total_seconds"] / count if count else 0.0,
+            }
+        return {
+            "rounds": self.rounds,
+            "calibration": self.calibration,
+            "rehashes": self.rehashes,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue_depth,
+            "in_flight": min(self._pending, self.workers),
+            "max_queue_depth": self._max_depth,
+            "rejected": self._rejected,
+            "latency": latency,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
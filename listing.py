@@ -0,0 +1,38 @@
+from typing import Optional
+
+from models import UserDB, UserDetailsDB
+
+
+# Listado paginado de usuarios con sus detalles.
+# Una sola consulta con LEFT JOIN sobre la relación `user_details` y
+# paginación por clave (id), así el coste de cada página no depende del
+# tamaño de la tabla.
+def list_users_page(db, page_size: int, after: Optional[int] = None, before: Optional[int] = None):
+    query = db.query(UserDB, UserDetailsDB).outerjoin(UserDB.user_details)
+
+    if before is not None:
+        # Página anterior: se lee hacia atrás y luego se invierte
+        rows = (
+            query.filter(UserDB.id < before)
+            .order_by(UserDB.id.desc())
+            .limit(page_size + 1)
+            .all()
+        )
+        has_more = len(rows) > page_size
+        rows = list(reversed(rows[:page_size]))
+        has_prev, has_next = has_more, True
+    else:
+        if after is not None:
+            query = query.filter(UserDB.id > after)
+        rows = query.order_by(UserDB.id).limit(page_size + 1).all()
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_prev = after is not None
+
+    items = [{"user": user, "details": details} for user, details in rows]
+    return {
+        "items": items,
+        "page_size": page_size,
+        "next_cursor": rows[-1][0].id if rows and has_next else None,
+        "prev_cursor": rows[0][0].id if rows and has_prev else None,
+    }
@@ -1,96 +1,94 @@
-from datetime import datetime, timedelta, timezone
-from fastapi import FastAPI, Depends, HTTPException, status, Response
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Response, Query, UploadFile, File
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 from typing import Optional
-from fastapi.responses import RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
+from datetime import datetime
+from fastapi.responses import RedirectResponse, ORJSONResponse, StreamingResponse, PlainTextResponse
 from starlette.requests import Request
-from dotenv import load_dotenv
-from fastapi.staticfiles import StaticFiles
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from jose import JWTError
+import logging
 import os
-from sqlalchemy import create_engine, Column, String, Integer
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.orm import relationship
-from sqlalchemy import ForeignKey
-
-
-
-# Cargar las variables de entorno desde el archivo .env
-load_dotenv()
-
-# Configuración de seguridad
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-
-app = FastAPI()
-templates = Jinja2Templates(directory="templates")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Configuración de CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://127.0.0.1:5500"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+from config import (
+    USERS_PAGE_SIZE, USERS_MAX_PAGE_SIZE, BCRYPT_ROUNDS, BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS, EXPORT_BATCH_SIZE,
+    BULK_BATCH_SIZE, BULK_HASH_CONCURRENCY, USERS_BATCH_CHUNK_SIZE, USERS_BATCH_MAX_ITEMS, Settings
 )
-
-# Configuración de la base de datos
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=10,       # Aumenta el tamaño del pool
-    max_overflow=20,    # Permite más conexiones adicionales
-    pool_timeout=30,    # Tiempo de espera antes de lanzar TimeoutError
-    pool_recycle=1800   # Recicla conexiones cada 30 minutos para evitar problemas
+from database import (
+    DBSession, get_db, get_pool_stats, create_schema, current_search_backend, configure, get_engine,
+    get_replicas, dispose_engine, warm_pool
+)
+from ratelimit import client_ip
+from listing import list_users_page
+from crud import (
+    DETAIL_FIELDS, get_user_by_username, get_user_by_id, get_user_with_details, update_password_hash,
+    create_user_with_details, update_user_with_details, delete_user_by_id, get_details_version
+)
+from export import EXPORT_COLUMNS, MEDIA_TYPES, stream_users
+from batch import BatchUpdateRequest, BatchDeleteRequest, apply_batch_update, apply_batch_delete
+from bulk_import import InvalidEncoding, detect_format, import_users
+from search import SEARCH_FIELDS, SORT_COLUMNS, search_etag, search_users
+from etag import etag_matches, not_modified, set_etag, version_etag
+from schemas import Message, UserDetailsOut, UserSearchPage, BulkImportResult, BatchResult
+from auth import (
+    CurrentUser, SessionRedirect, session_redirect_handler, create_access_token,
+    set_token_cookie, set_no_cache_headers, current_user, current_user_api,
+    token_cache, decode_token
+)
+from admission import AdmissionMiddleware, admission_control
+from events import TooManyClients, user_row
+from services import Services, get_services
+from compression import CompressionMiddleware
+from static_assets import AssetFiles, asset_url
+from markupsafe import Markup
+from metrics import (
+    DB_POOL_TIMEOUTS, TEMPLATE_RENDER_SECONDS, MetricsMiddleware, StartupTimer, instrument_templates, registry
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Modelo de usuario en la base de datos
-class UserDB(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True)
-    hashed_password = Column(String)
-
-    # Relación uno a uno con user_details
-    user_details = relationship("UserDetailsDB", back_populates="user", uselist=False)
 
-# Crear todas las tablas en la base de datos
-Base.metadata.create_all(bind=engine)
 
-# Crear la clase para la tabla `user_details`
-class UserDetailsDB(Base):
-    __tablename__ = "user_details"
-    user_id = Column(Integer, primary_key=True, index=True)
-    first_name = Column(String, nullable=False)
-    last_name = Column(String, nullable=False)
-    dob = Column(String)
-    location = Column(String)
-    bio = Column(String)
+logger = logging.getLogger(__name__)
 
-    # Relacionado con el usuario (clave foránea)
-    user = relationship("UserDB", back_populates="user_details")
+# Las rutas se registran en un router y create_app() arma la aplicación
+router = APIRouter()
 
-    # Establecer la clave foránea explícita
-    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+# Pool de conexiones agotado: 503 en lugar de un 500 tras esperar pool_timeout
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    DB_POOL_TIMEOUTS.inc()
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Base de datos saturada, intente de nuevo"},
+        headers={"Retry-After": "1"},
+    )
 
-# Relación en UserDB
-UserDB.user_details = relationship("UserDetailsDB", uselist=False, back_populates="user")
+# Plantillas Jinja: se crean (e importa Jinja) con la primera página renderizada
+@lru_cache(maxsize=None)
+def get_templates():
+    from fastapi.templating import Jinja2Templates
+    templates = Jinja2Templates(directory="templates")
+    # URLs de CSS/JS con huella (o las originales si no se ejecutó build-assets)
+    templates.env.globals["asset_url"] = asset_url
+    return instrument_templates(templates)
+
+# Carga y compila todas las plantillas (e importa Jinja) antes de la primera petición
+def warm_templates() -> int:
+    env = get_templates().env
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+# Política de coste de bcrypt: fija por configuración o calibrada en este equipo
+async def init_password_policy(hasher):
+    if BCRYPT_ROUNDS:
+        hasher.set_rounds(BCRYPT_ROUNDS)
+        return
+    calibration = await hasher.calibrate(BCRYPT_TARGET_MS / 1000, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS)
+    logger.info(
+        "bcrypt calibrado: %s rondas (~%.0f ms, objetivo %.0f ms)",
+        calibration["rounds"], calibration["estimated_seconds"] * 1000, BCRYPT_TARGET_MS
+    )
 
 
 class User(BaseModel):
@@ -119,51 +117,43 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-# Función para verificar la contraseña
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
 # Función para obtener un usuario desde la base de datos
 def get_user(db, username: str):
-    user = db.query(UserDB).filter(UserDB.username == username).first()
+    user = get_user_by_username(db, username)
     if user:
         return User(username=user.username, hashed_password=user.hashed_password)
     return None
 
-# Función para obtener los detalles del usuario
-def get_user_details(db, user_id: int):
-    return db.query(UserDetailsDB).filter(UserDetailsDB.user_id == user_id).first()
+# Tamaño de página pedido, acotado a los límites configurados
+def clamp_page_size(page_size: Optional[int]):
+    if not page_size:
+        return USERS_PAGE_SIZE
+    return max(1, min(page_size, USERS_MAX_PAGE_SIZE))
 
-# Función para autenticar al usuario
-def authenticate_user(db, username: str, password: str):
-    user = get_user(db, username)
+# Función para autenticar al usuario (bcrypt se ejecuta fuera del event loop)
+async def authenticate_user(db: DBSession, hasher, username: str, password: str):
+    user = await db.run(get_user, username)
     if not user:
+        return await hasher.dummy_verify(password)
+    valid, new_hash = await hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return False
-    if not verify_password(password, user.hashed_password):
-        return False
+    # El hash guardado no cumple la política actual: se reemplaza tras el login correcto
+    if new_hash:
+        await db.run(update_password_hash, user.username, new_hash)
     return user
 
-# Función para crear el token de acceso
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    # Incluir timestamp de la última actividad
-    to_encode['last_activity'] = datetime.now(timezone.utc).isoformat()
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-# Verificar si la sesión está expirada por inactividad
-def is_session_expired(last_activity: str, inactivity_limit_minutes: int = 30):
-    last_activity_time = datetime.fromisoformat(last_activity)
-    now = datetime.now(timezone.utc)
-    inactivity_duration = now - last_activity_time
-    return inactivity_duration > timedelta(minutes=inactivity_limit_minutes)
-
-
 # Ruta para login
-@app.post("/token", response_model=Token)
-async def login_for_access_token(response: Response, form_data: OAuth2PasswordRequestForm = Depends()):
-    db = SessionLocal()
-    user = authenticate_user(db, form_data.username, form_data.password)
+@router.post("/token", response_model=Token)
+async def login_for_access_token(
+    request: Request,
+    response: Response,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: DBSession = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    services.login_limiter.check(client_ip(request), form_data.username)
+    user = await authenticate_user(db, services.hasher, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -172,17 +162,11 @@ async def login_for_access_token(response: Response, form_data: OAuth2PasswordRe
         )
 
     access_token = create_access_token(data={"sub": user.username})
-    response.set_cookie(
-        key="access_token",
-        value=access_token,  
-        httponly=True,
-        secure=True,  
-        samesite="Lax"
-    )
+    set_token_cookie(response, access_token)
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Ruta de inicio
-@app.get("/")
+@router.get("/")
 async def read_root(request: Request):
     token = request.cookies.get("access_token")
     session_expired = False  
@@ -192,418 +176,640 @@ async def read_root(request: Request):
 
     session_expired = request.cookies.get("session_expired", "false") == "true"
 
-    response = templates.TemplateResponse("index.html", {
+    response = get_templates().TemplateResponse("index.html", {
         "request": request,
         "session_expired": session_expired
     })
     
-    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
+    set_no_cache_headers(response)
     return response
 
 # Rutas protegidas
-@app.get("/users/me")
-async def read_users_me(request: Request):
-    token = request.cookies.get("access_token")
-
-    if not token:
-        return RedirectResponse("/", status_code=302)
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        last_activity = payload.get("last_activity")
-
-
-        if not last_activity or is_session_expired(last_activity):
-            response = RedirectResponse("/", status_code=302)
-            response.delete_cookie(key="access_token")  
-            
-
-            expires_in=datetime.now(timezone.utc) + timedelta(seconds=3) 
-
-            response.set_cookie(
-                key="session_expired",
-                value="true",
-                httponly=True,
-                secure=True,
-                samesite="Lax",
-                max_age=3, 
-                expires=expires_in  
-            )
-            return response
-        db = SessionLocal()
-        user = db.query(UserDB).filter(UserDB.username == username).first()
-        user_details = get_user_details(db, user.id)
-
-        # Actualizar el timestamp de la última actividad
-        payload['last_activity'] = datetime.now(timezone.utc).isoformat()
-        new_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
-
-        response = templates.TemplateResponse("welcome.html", {"request": request, "username": f'{user_details.first_name} {user_details.last_name}'})
-        response.set_cookie(
-            key="access_token",
-            value=new_token,
-            httponly=True,
-            secure=True,
-            samesite="Lax"
-        )
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        return response
-
-    except JWTError:
-        return RedirectResponse("/", status_code=302)
-
-@app.get("/users/me/profile")
-async def read_users_me_profile(request: Request):
-    token = request.cookies.get("access_token")
-
-    if not token:
-        return RedirectResponse("/", status_code=302)
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        last_activity = payload.get("last_activity")
-
-
-        if not last_activity or is_session_expired(last_activity):
-            response = RedirectResponse("/", status_code=302)
-            response.delete_cookie(key="access_token")  
-
-            expires_in = datetime.now(timezone.utc) + timedelta(seconds=3)
-
-            response.set_cookie(
-                key="session_expired",
-                value="true",
-                httponly=True,
-                secure=True,
-                samesite="Lax",
-                max_age=3,
-                expires=expires_in
-            )
-            return response
-
- 
-        db = SessionLocal()
-        user = db.query(UserDB).filter(UserDB.username == username).first()
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-
-        user_details = get_user_details(db, user.id)
-
-        if not user_details:
-            raise HTTPException(status_code=404, detail="User details not found")
-
-
-        payload['last_activity'] = datetime.now(timezone.utc).isoformat()
-        new_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
-
-
-        response = templates.TemplateResponse(
-            "profile.html", {
-                "request": request,
-                "username": f'{user_details.first_name} {user_details.last_name}',
-                "userFullName": user_details.first_name,
-                "userLastName": user_details.last_name,
-                "userEmail": user.username, 
-                "userDOB": user_details.dob,
-                "userLocation": user_details.location,
-                "userBio": user_details.bio
-            }
-        )
-
-        response.set_cookie(
-            key="access_token",
-            value=new_token,
-            httponly=True,
-            secure=True,
-            samesite="Lax"
-        )
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        return response
-
-    except JWTError:
-        return RedirectResponse("/", status_code=302)
+@router.get("/users/me")
+async def read_users_me(request: Request, current: CurrentUser = Depends(current_user)):
+    response = get_templates().TemplateResponse("welcome.html", {"request": request, "username": current.full_name})
+    return current.apply(response)
+
+@router.get("/users/me/profile")
+async def read_users_me_profile(request: Request, current: CurrentUser = Depends(current_user)):
+    user_details = current.details
+    if not user_details:
+        raise HTTPException(status_code=404, detail="User details not found")
+
+    response = get_templates().TemplateResponse(
+        "profile.html", {
+            "request": request,
+            "username": current.full_name,
+            "userFullName": user_details.first_name,
+            "userLastName": user_details.last_name,
+            "userEmail": current.user.username, 
+            "userDOB": user_details.dob,
+            "userLocation": user_details.location,
+            "userBio": user_details.bio
+        }
+    )
+    return current.apply(response)
     
-@app.put("/users/me/update_profile", response_model=UserDetails)
+@router.put("/users/me/update_profile", response_model=Message)
 async def update_user_profile(
+    request: Request,
+    response: Response,
     user_update: UserUpdate, 
-    db: Session = Depends(get_db),
-    request: Request = None
+    db: DBSession = Depends(get_db),
+    current: CurrentUser = Depends(current_user_api),
+    services: Services = Depends(get_services)
 ):
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user = db.query(UserDB).filter(UserDB.username == username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-
-        if not verify_password(user_update.current_password, user.hashed_password):
-            raise HTTPException(status_code=400, detail="Incorrect current password")
-        
- 
-        if user_update.new_password:
-            if user_update.new_password != user_update.confirm_password:
-                raise HTTPException(status_code=400, detail="Passwords do not match")
-            user.hashed_password = pwd_context.hash(user_update.new_password)
-        
-
-        user_details = get_user_details(db, user.id)
-        if not user_details:
-            raise HTTPException(status_code=404, detail="User details not found")
-        
-        user_details.first_name = user_update.first_name
-        user_details.last_name = user_update.last_name
-        user_details.dob = user_update.dob
-        user_details.location = user_update.location
-        user_details.bio = user_update.bio
-
-        db.commit()
-        
-
-        payload['last_activity'] = datetime.now(timezone.utc).isoformat()
-        new_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
-        
+    services.login_limiter.check(client_ip(request), current.user.username)
 
-        response = {"message": "Perfil actualizado con éxito."}  
-        return JSONResponse(content=response, status_code=200)  
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
-
-@app.get("/users/me/show")
-async def read_users_me(request: Request):
-    token = request.cookies.get("access_token")
-
-    if not token:
-        return RedirectResponse("/", status_code=302)
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        last_activity = payload.get("last_activity")
+    # El perfil de la sesión viene de la caché: se carga la fila actual para escribir
+    row = await db.run(get_user_with_details, current.user.username)
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    user, user_details = row
 
+    if not await services.hasher.verify(user_update.current_password, user.hashed_password):
+        raise HTTPException(status_code=400, detail="Incorrect current password")
+    
 
-        if not last_activity or is_session_expired(last_activity):
-            response = RedirectResponse("/", status_code=302)
-            response.delete_cookie(key="access_token") 
+    hashed_password = None
+    if user_update.new_password:
+        if user_update.new_password != user_update.confirm_password:
+            raise HTTPException(status_code=400, detail="Passwords do not match")
+        hashed_password = await services.hasher.hash(user_update.new_password)
+    
 
-            expires_in = datetime.now(timezone.utc) + timedelta(seconds=3)
+    if not user_details:
+        raise HTTPException(status_code=404, detail="User details not found")
+    
+    await db.run(
+        update_user_with_details, user, user_update.model_dump(include=set(DETAIL_FIELDS)),
+        hashed_password=hashed_password, user_details=user_details
+    )
+    services.profile_cache.invalidate(user_id=user.id, username=user.username)
+    services.directory_cache.bump()
+    await services.directory_events.publish_rows("updated", [
+        user_row(user.id, user_update.model_dump(include=set(DETAIL_FIELDS)))
+    ])
+    
 
-            response.set_cookie(
-                key="session_expired",
-                value="true",
-                httponly=True,
-                secure=True,
-                samesite="Lax",
-                max_age=3,
-                expires=expires_in
+    current.apply(response)
+    return {"message": "Perfil actualizado con éxito."}
+
+# Tabla del directorio de una página (filas + paginación). Con la caché en
+# caliente no hay consulta ni bucle de Jinja: solo se inserta el HTML guardado.
+async def render_directory_table(db: DBSession, directory_cache, after: Optional[int], before: Optional[int],
+                                 page_size: int):
+    key = (after, before, page_size)
+    html = directory_cache.get(key)
+    if html is None:
+        version = directory_cache.version
+        # El fragmento se guarda hasta el próximo cambio (o el TTL): se lee de
+        # la primaria, como el perfil en la caché de perfiles, porque una
+        # réplica con retraso podría dejar en caché la tabla de antes del cambio
+        page = await db.run(list_users_page, page_size, after=after, before=before)
+        with TEMPLATE_RENDER_SECONDS.time("_directory_table.html"):
+            html = get_templates().get_template("_directory_table.html").render(
+                all_users_with_details=page["items"], page=page
             )
-            return response
-        
-        db = SessionLocal()
-        user = db.query(UserDB).filter(UserDB.username == username).first()
-        user_details = get_user_details(db, user.id)
-        user_name=user_details.first_name
-        user_last_name=user_details.last_name
-        all_users = db.query(UserDB).all() 
-
-        all_users_with_details = []
-        for user in all_users:
-            user_details = get_user_details(db, user.id)
-            all_users_with_details.append({"user": user, "details": user_details})
-
-
-        payload['last_activity'] = datetime.now(timezone.utc).isoformat()
-        new_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
-
-
-        response = templates.TemplateResponse("show.html", {
-            "request": request, 
-            "username": f'{user_name} {user_last_name}', 
-            "all_users_with_details": all_users_with_details
-        })
-
-        response.set_cookie(
-            key="access_token",
-            value=new_token,
-            httponly=True,
-            secure=True,
-            samesite="Lax"
+        directory_cache.set(key, html, version)
+    return Markup(html)
+
+# Página del directorio de usuarios (compartida por show y register_show):
+# solo el marco con el nombre del usuario se renderiza en cada petición
+async def render_user_directory(template: str, request: Request, db: DBSession, current: CurrentUser,
+                                after: Optional[int], before: Optional[int], page_size: Optional[int]):
+    directory_cache = get_services(request).directory_cache
+    table = await render_directory_table(db, directory_cache, after, before, clamp_page_size(page_size))
+    response = get_templates().TemplateResponse(template, {
+        "request": request, 
+        "username": current.full_name, 
+        "directory_table": table,
+    })
+    return current.apply(response)
+
+@router.get("/users/me/show")
+async def read_users_show(
+    request: Request,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    page_size: Optional[int] = None,
+    db: DBSession = Depends(get_db),
+    current: CurrentUser = Depends(current_user)
+):
+    return await render_user_directory("show.html", request, db, current, after, before, page_size)
+
+@router.get("/users/me/register_show")
+async def read_users_register_show(
+    request: Request,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    page_size: Optional[int] = None,
+    db: DBSession = Depends(get_db),
+    current: CurrentUser = Depends(current_user)
+):
+    return await render_user_directory("register_show.html", request, db, current, after, before, page_size)
+
+# Cambios del directorio en tiempo real (Server-Sent Events): las páginas del
+# directorio actualizan las filas afectadas en lugar de recargarse. El
+# navegador se reconecta solo y envía Last-Event-ID para recibir lo perdido.
+@router.get("/users/events")
+async def directory_events_stream(
+    request: Request,
+    current: CurrentUser = Depends(current_user_api),
+    services: Services = Depends(get_services)
+):
+    try:
+        subscriber = services.directory_events.subscribe(request.headers.get("last-event-id"))
+    except TooManyClients:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiados clientes conectados",
+            headers={"Retry-After": "5"},
+        )
+    response = StreamingResponse(
+        services.directory_events.stream(subscriber),
+        media_type="text/event-stream",
+        # Sin búfer en nginx: cada evento se envía al momento
+        headers={"X-Accel-Buffering": "no"},
+    )
+    return current.apply(response)
+
+# Exportación completa del directorio en CSV o NDJSON, enviada por lotes.
+# `columns` es una lista separada por comas y `updated_since` permite
+# descargas incrementales de los usuarios modificados desde esa fecha.
+@router.get("/users/export")
+async def export_users(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    columns: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    current: CurrentUser = Depends(current_user_api)
+):
+    selected = [name.strip() for name in columns.split(",") if name.strip()] if columns else list(EXPORT_COLUMNS)
+    unknown = [name for name in selected if name not in EXPORT_COLUMNS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Columnas no válidas: {', '.join(unknown)}. Disponibles: {', '.join(EXPORT_COLUMNS)}"
         )
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        return response
-
-    except JWTError:
-        return RedirectResponse("/", status_code=302)
-
-@app.get("/users/me/register_show")
-async def read_users_me(request: Request):
-    token = request.cookies.get("access_token")
-
-    if not token:
-        return RedirectResponse("/", status_code=302)
 
+    response = StreamingResponse(
+        stream_users(selected, format, updated_since, EXPORT_BATCH_SIZE),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'}
+    )
+    return current.apply(response)
+
+# Búsqueda de usuarios por nombre, correo (username) o lugar.
+# `fields` es una lista separada por comas; `mode` es prefix o substring.
+@router.get("/users/search", response_model=UserSearchPage)
+async def search_users_route(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    fields: str = "name,email,location",
+    mode: str = Query("prefix", pattern="^(prefix|substring)$"),
+    sort: str = "id",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    page: int = Query(1, ge=1),
+    page_size: Optional[int] = None,
+    db: DBSession = Depends(get_db),
+    current: CurrentUser = Depends(current_user_api)
+):
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    if not selected or any(name not in SEARCH_FIELDS for name in selected):
+        raise HTTPException(status_code=400, detail=f"Campos válidos: {', '.join(SEARCH_FIELDS)}")
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Orden válido: {', '.join(SORT_COLUMNS)}")
+
+    args = (q, selected, mode, sort, order == "desc", page, clamp_page_size(page_size))
+    # Revalidación: solo se leen (id, versión) de la página para comparar el ETag
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etag = await db.read(search_etag, current_search_backend(), *args)
+        if etag_matches(if_none_match, etag):
+            return current.apply(not_modified(etag))
+
+    # Las filas ya tienen la forma de UserSearchPage: se codifican directamente
+    # con orjson, sin validar cada item (es el camino caliente de la búsqueda)
+    results = await db.read(search_users, current_search_backend(), *args)
+    etag = results.pop("etag")
+    return current.apply(set_etag(ORJSONResponse(results), etag))
+
+# Importación masiva de usuarios desde un archivo CSV o NDJSON con las columnas
+# username, password, first_name, last_name, dob, location y bio.
+# Devuelve los usuarios creados, los errores por fila y estadísticas de rendimiento.
+@router.post("/users/bulk", response_model=BulkImportResult)
+async def bulk_create_users(
+    response: Response,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    batch_size: Optional[int] = Query(None, ge=1, le=5000),
+    db: DBSession = Depends(get_db),
+    current: CurrentUser = Depends(current_user_api),
+    services: Services = Depends(get_services)
+):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        last_activity = payload.get("last_activity")
-
-        if not last_activity or is_session_expired(last_activity):
-            response = RedirectResponse("/", status_code=302)
-            response.delete_cookie(key="access_token") 
-
-            expires_in = datetime.now(timezone.utc) + timedelta(seconds=3)
-
-            response.set_cookie(
-                key="session_expired",
-                value="true",
-                httponly=True,
-                secure=True,
-                samesite="Lax",
-                max_age=3,
-                expires=expires_in
-            )
-            return response
-
-        db = SessionLocal()
-        user = db.query(UserDB).filter(UserDB.username == username).first()
-        user_details = get_user_details(db, user.id)
-        user_name=user_details.first_name
-        user_last_name=user_details.last_name
-        all_users = db.query(UserDB).all()  
-
-        all_users_with_details = []
-        for user in all_users:
-            user_details = get_user_details(db, user.id)
-            all_users_with_details.append({"user": user, "details": user_details})
-
-
-        payload['last_activity'] = datetime.now(timezone.utc).isoformat()
-        new_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
-
-
-        response = templates.TemplateResponse("register_show.html", {
-            "request": request, 
-            "username": f'{user_name} {user_last_name}', 
-            "all_users_with_details": all_users_with_details
-        })
-
-        response.set_cookie(
-            key="access_token",
-            value=new_token,
-            httponly=True,
-            secure=True,
-            samesite="Lax"
+        report = await import_users(
+            file.file, detect_format(file.filename, format), db, services.hasher,
+            batch_size or BULK_BATCH_SIZE, BULK_HASH_CONCURRENCY
+        )
+    except InvalidEncoding as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    for username, user_id in report["created"]:
+        services.profile_cache.invalidate(user_id=user_id, username=username)
+    if report["created"]:
+        services.directory_cache.bump()
+        # Sin los detalles a mano: las páginas abiertas recargan la tabla
+        await services.directory_events.publish("reset")
+
+    current.apply(response)
+    return {
+        "message": f"{report['stats']['created']} usuarios creados",
+        "errors": report["errors"],
+        "stats": report["stats"],
+    }
+
+def check_batch_size(count: int):
+    if count > USERS_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Máximo {USERS_BATCH_MAX_ITEMS} usuarios por petición"
         )
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        return response
 
-    except JWTError:
-        return RedirectResponse("/", status_code=302)
+# Las operaciones por lotes piden la contraseña de quien las hace: un intento
+# en el limitador y un verify de bcrypt por petición, sea cual sea el tamaño
+# del lote. Si el limitador la rechaza, la petición entera responde 429.
+async def authorize_batch(request: Request, db: DBSession, services: Services, current: CurrentUser,
+                          password: str):
+    services.login_limiter.check(client_ip(request), current.user.username)
+    user = await db.run(get_user_by_username, current.user.username)
+    if user is None or not await services.hasher.verify(password, user.hashed_password):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Contraseña incorrecta")
 
-@app.post("/users/me/create")
-def create_user(user: User, user_details: UserDetails, db: Session = Depends(get_db)):
+# Actualización de los detalles de muchos usuarios en una transacción, con
+# sentencias UPDATE por conjuntos y un resultado por elemento del lote
+@router.patch("/users/batch", response_model=BatchResult)
+async def batch_update_users(
+    request: Request,
+    response: Response,
+    batch: BatchUpdateRequest,
+    chunk_size: Optional[int] = Query(None, ge=1, le=5000),
+    db: DBSession = Depends(get_db),
+    current: CurrentUser = Depends(current_user_api),
+    services: Services = Depends(get_services)
+):
+    check_batch_size(len(batch.items))
+    await authorize_batch(request, db, services, current, batch.current_password)
+    report = await db.run(apply_batch_update, batch.items, chunk_size or USERS_BATCH_CHUNK_SIZE)
+    for user_id, username in report["affected"].items():
+        services.profile_cache.invalidate(user_id=user_id, username=username)
+    if report["affected"]:
+        services.directory_cache.bump()
+        await services.directory_events.publish_rows("updated", [
+            user_row(item.id, item.changes()) for item in batch.items if item.id in report["affected"]
+        ])
+
+    current.apply(response)
+    return {"message": f"{report['stats']['applied']} usuarios actualizados", **report}
+
+# Borrado de muchos usuarios en una transacción (DELETE ... IN por trozos)
+@router.post("/users/batch/delete", response_model=BatchResult)
+async def batch_delete_users(
+    request: Request,
+    response: Response,
+    batch: BatchDeleteRequest,
+    chunk_size: Optional[int] = Query(None, ge=1, le=5000),
+    db: DBSession = Depends(get_db),
+    current: CurrentUser = Depends(current_user_api),
+    services: Services = Depends(get_services)
+):
+    check_batch_size(len(batch.ids))
+    await authorize_batch(request, db, services, current, batch.current_password)
+    report = await db.run(apply_batch_delete, batch.ids, chunk_size or USERS_BATCH_CHUNK_SIZE)
+    for user_id, username in report["affected"].items():
+        services.profile_cache.invalidate(user_id=user_id, username=username)
+    if report["affected"]:
+        services.directory_cache.bump()
+        await services.directory_events.publish("deleted", ids=list(report["affected"]))
+
+    current.apply(response)
+    return {"message": f"{report['stats']['applied']} usuarios eliminados", **report}
+
+@router.post("/users/me/create", response_model=Message)
+async def create_user(
+    user: User,
+    user_details: UserDetails,
+    db: DBSession = Depends(get_db),
+    services: Services = Depends(get_services)
+):
 
-    db_user = db.query(UserDB).filter(UserDB.username == user.username).first()
+    db_user = await db.run(get_user_by_username, user.username)
     if db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Usuario ya existe")
 
 
-    hashed_password = pwd_context.hash(user.hashed_password)
+    hashed_password = await services.hasher.hash(user.hashed_password)
 
 
-    new_user = UserDB(username=user.username, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-
-    new_user_details = UserDetailsDB(
-        user_id=new_user.id,
-        first_name=user_details.first_name,
-        last_name=user_details.last_name,
-        dob=user_details.dob,
-        location=user_details.location,
-        bio=user_details.bio
-    )
-    db.add(new_user_details)
-    db.commit()
-    db.refresh(new_user_details)
+    user_id = await db.run(create_user_with_details, user.username, hashed_password, user_details.model_dump())
+    services.profile_cache.invalidate(user_id=user_id, username=user.username)
+    services.directory_cache.bump()
+    await services.directory_events.publish_rows("created", [
+        user_row(user_id, user_details.model_dump(), user.username)
+    ])
 
     return {"message": "Usuario creado exitosamente"}
 
-@app.get("/users/me/{user_id}")
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    user_details = db.query(UserDetailsDB).filter(UserDetailsDB.user_id == user_id).first()
-    if user_details is None:
+@router.get("/users/me/{user_id}", response_model=UserDetailsOut)
+async def read_user(
+    request: Request,
+    response: Response,
+    user_id: int,
+    db: DBSession = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    # Con If-None-Match basta la versión (de la caché o de una consulta de una columna)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        cached = services.profile_cache.cached_by_id(user_id)
+        version = cached["version"] if cached else await db.run(get_details_version, user_id)
+        etag = version_etag("user", user_id, version)
+        if version is not None and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    profile = await services.profile_cache.get_by_id(db, user_id)
+    if profile is None or profile["details"] is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
     
-    return user_details
-
-@app.put("/users/me/{user_id}")
-def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)):
-    user = db.query(UserDB).filter(UserDB.id == user_id).first()
+    set_etag(response, version_etag("user", user_id, profile["version"]))
+    return profile["details"]
+
+@router.put("/users/me/{user_id}", response_model=Message)
+async def update_user(
+    request: Request,
+    user_id: int,
+    user_update: UserUpdate,
+    db: DBSession = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    user = await db.run(get_user_by_id, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
 
+    services.login_limiter.check(client_ip(request), user.username)
 
-    if not verify_password(user_update.current_password, user.hashed_password):
+    if not await services.hasher.verify(user_update.current_password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Contraseña incorrecta")
 
 
+    hashed_password = None
     if user_update.new_password:
-        user.hashed_password = pwd_context.hash(user_update.new_password)
-
-    user_details = db.query(UserDetailsDB).filter(UserDetailsDB.user_id == user_id).first()
-    if user_details:
-        user_details.first_name = user_update.first_name
-        user_details.last_name = user_update.last_name
-        user_details.dob = user_update.dob
-        user_details.location = user_update.location
-        user_details.bio = user_update.bio
-        db.commit()
-        db.refresh(user_details)
-
-    db.commit()
-    db.refresh(user)
+        hashed_password = await services.hasher.hash(user_update.new_password)
+
+    await db.run(
+        update_user_with_details, user, user_update.model_dump(include=set(DETAIL_FIELDS)),
+        hashed_password=hashed_password
+    )
+    services.profile_cache.invalidate(user_id=user.id, username=user.username)
+    services.directory_cache.bump()
+    await services.directory_events.publish_rows("updated", [
+        user_row(user.id, user_update.model_dump(include=set(DETAIL_FIELDS)))
+    ])
     return {"message": "Usuario actualizado exitosamente"}
 
-@app.delete("/users/me/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(UserDB).filter(UserDB.id == user_id).first()
+@router.delete("/users/me/{user_id}", response_model=Message)
+async def delete_user(
+    user_id: int,
+    db: DBSession = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    user = await db.run(get_user_by_id, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
 
-    db.query(UserDetailsDB).filter(UserDetailsDB.user_id == user_id).delete()
-    db.query(UserDB).filter(UserDB.id == user_id).delete()
-    db.commit()
+    await db.run(delete_user_by_id, user_id)
+    services.profile_cache.invalidate(user_id=user_id, username=user.username)
+    services.directory_cache.bump()
+    await services.directory_events.publish("deleted", ids=[user_id])
     return {"message": "Usuario eliminado exitosamente"}
 
 
-# Ruta para logout
-@app.post("/logout")
-async def logout(response: Response):
+# Métricas del pool de hashing (profundidad de cola y latencias)
+@router.get("/metrics/hashing")
+async def hashing_metrics(services: Services = Depends(get_services)):
+    return services.hasher.stats()
+
+# Estado del pool de conexiones (checkouts/checkins para detectar fugas)
+@router.get("/metrics/pool")
+async def pool_metrics():
+    return get_pool_stats()
+
+# Aciertos, fallos y expulsiones de la caché de perfiles y de tokens verificados
+@router.get("/metrics/cache")
+async def cache_metrics(services: Services = Depends(get_services)):
+    return {
+        "profiles": services.profile_cache.stats(),
+        "tokens": token_cache.stats(),
+        "directory": services.directory_cache.stats(),
+    }
+
+# Intentos de contraseña permitidos y rechazados por el limitador
+@router.get("/metrics/ratelimit")
+async def ratelimit_metrics(services: Services = Depends(get_services)):
+    return services.login_limiter.stats()
+
+# Estado de los servicios en memoria, leído en cada scrape de /metrics
+def service_metrics(services: Services):
+    pool = get_pool_stats()
+    hashing = services.hasher.stats()
+    limiter = services.login_limiter.stats()
+    revocations = services.token_revocations.stats()
+    caches = {
+        "profiles": services.profile_cache.stats(),
+        "tokens": token_cache.stats(),
+        "directory": services.directory_cache.stats(),
+    }
+    yield ("db_pool_connections", "gauge", "Conexiones del pool por estado", [
+        ({"state": state}, pool[state]) for state in ("checkedout", "checkedin", "overflow", "size") if state in pool
+    ])
+    yield ("db_pool_events_total", "counter", "Conexiones abiertas, checkouts y checkins del pool", [
+        ({"event": event}, pool[event]) for event in ("connects", "checkouts", "checkins")
+    ])
+    if "replicas" in pool:
+        replicas = pool["replicas"]["replicas"]
+        yield ("db_replica_up", "gauge", "Réplicas de lectura disponibles (1) o fuera del reparto (0)", [
+            ({"replica": replica["name"]}, int(replica["healthy"])) for replica in replicas
+        ])
+        yield ("db_replica_reads_total", "counter", "Lecturas servidas por cada réplica", [
+            ({"replica": replica["name"]}, replica["reads"]) for replica in replicas
+        ])
+        yield ("db_replica_fallbacks_total", "counter", "Lecturas repetidas en la primaria por fallo de una réplica",
+               [({}, pool["replicas"]["fallbacks"])])
+    yield ("bcrypt_queue_depth", "gauge", "Tareas de bcrypt esperando un hilo libre",
+           [({}, hashing["queue_depth"])])
+    yield ("bcrypt_in_flight", "gauge", "Tareas de bcrypt en ejecución", [({}, hashing["in_flight"])])
+    yield ("bcrypt_rejected_total", "counter", "Tareas de bcrypt rechazadas con 503 por cola llena",
+           [({}, hashing["rejected"])])
+    for name in ("hits", "misses", "evictions", "expirations"):
+        yield (f"cache_{name}_total", "counter", f"Caché en memoria: {name}", [
+            ({"cache": cache}, values[name]) for cache, values in caches.items()
+        ])
+    yield ("cache_entries", "gauge", "Entradas en cada caché en memoria", [
+        ({"cache": cache}, values["entries"]) for cache, values in caches.items()
+    ])
+    yield ("directory_cache_bytes", "gauge", "Memoria usada por los fragmentos del directorio",
+           [({}, caches["directory"]["bytes"])])
+    yield ("directory_cache_invalidations_total", "counter", "Veces que un cambio de usuarios vació la caché del directorio",
+           [({}, caches["directory"]["invalidations"])])
+    yield ("revoked_sessions", "gauge", "Sesiones revocadas y usuarios con corte de sesiones en memoria", [
+        ({"kind": "session"}, revocations["sessions"]), ({"kind": "user"}, revocations["users"])
+    ])
+    admission = [(name, values) for name, values in admission_control.stats().items() if name != "enabled"]
+    yield ("admission_in_flight", "gauge", "Peticiones admitidas en curso por clase de ruta", [
+        ({"class": name}, values["active"]) for name, values in admission
+    ])
+    yield ("admission_queued", "gauge", "Peticiones esperando en la cola de admisión", [
+        ({"class": name}, values["queued"]) for name, values in admission
+    ])
+    events = services.directory_events.stats()
+    yield ("events_clients", "gauge", "Clientes conectados a /users/events", [({}, events["clients"])])
+    yield ("events_published_total", "counter", "Eventos del directorio publicados", [({}, events["published"])])
+    yield ("events_dropped_clients_total", "counter", "Clientes de /users/events desconectados por no leer a tiempo",
+           [({}, events["dropped"])])
+    yield ("login_attempts_total", "counter", "Intentos de contraseña según el limitador", [
+        ({"result": "allowed"}, limiter["allowed"]), ({"result": "rejected"}, limiter["rejected"])
+    ])
+
+# Peticiones en curso, en cola y rechazadas por clase de ruta
+@router.get("/metrics/admission")
+async def admission_metrics():
+    return admission_control.stats()
+
+# Clientes conectados a /users/events y eventos enviados o descartados
+@router.get("/metrics/events")
+async def events_metrics(services: Services = Depends(get_services)):
+    return services.directory_events.stats()
+
+# Métricas en formato de texto de Prometheus
+@router.get("/metrics")
+async def prometheus_metrics(services: Services = Depends(get_services)):
+    return PlainTextResponse(
+        registry.render([partial(service_metrics, services)]), media_type="text/plain; version=0.0.4"
+    )
+
+
+# Ruta para logout: además de borrar la cookie se revoca la sesión del token,
+# así una copia del JWT deja de valer antes de su caducidad
+@router.post("/logout")
+async def logout(
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_db),
+    services: Services = Depends(get_services)
+):
+    token = request.cookies.get("access_token")
+    if token:
+        try:
+            await services.token_revocations.revoke_session(db, decode_token(token))
+        except JWTError:
+            pass
     response.delete_cookie(key="access_token")
     return RedirectResponse("/", status_code=302, headers={
         "Set-Cookie": "access_token=; Max-Age=0; Path=/; HttpOnly; Secure; SameSite=Lax"
         
     })
 
-app.mount("/assets", StaticFiles(directory="assets"), name="assets")
\ No newline at end of file
+# Cerrar todas las sesiones del usuario (en todos los navegadores y workers)
+@router.post("/logout/all")
+async def logout_all_sessions(
+    db: DBSession = Depends(get_db),
+    current: CurrentUser = Depends(current_user_api),
+    services: Services = Depends(get_services)
+):
+    await services.token_revocations.revoke_all(db, current.user.username)
+    return RedirectResponse("/", status_code=302, headers={
+        "Set-Cookie": "access_token=; Max-Age=0; Path=/; HttpOnly; Secure; SameSite=Lax"
+    })
+
+
+# Arranque y parada de la aplicación. El engine se crea aquí y no al importar;
+# el esquema se crea con `python manage.py create-schema` (o al arrancar si
+# settings.create_schema, pensado para desarrollo). Con settings.warmup se
+# abren las conexiones del pool y se compilan las plantillas antes de aceptar
+# peticiones. La duración de cada fase queda en el log y en /metrics.
+# Los servicios en memoria (pool de bcrypt, cachés, limitador, revocaciones y
+# eventos) se crean aquí para cada aplicación y solo se paran los suyos.
+def build_lifespan(settings: Settings):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        timer = StartupTimer()
+        app.state.services = services = Services()
+        with timer.phase("database"):
+            configure(settings.database_url, settings.replica_urls)
+            get_engine()
+            # Réplicas de lectura: comprobación inicial y periódica
+            replicas = get_replicas()
+            if replicas is not None:
+                await replicas.start()
+        if settings.create_schema:
+            with timer.phase("schema"):
+                await create_schema()
+        with timer.phase("password_policy"):
+            await init_password_policy(services.hasher)
+        # Revocaciones de sesión: carga inicial y sondeo de las de otros workers
+        with timer.phase("revocations"):
+            await services.token_revocations.start()
+            await services.directory_events.start()
+        if settings.warmup:
+            with timer.phase("warm_pool"):
+                await warm_pool()
+            with timer.phase("warm_templates"):
+                warm_templates()
+        logger.info("Worker %s listo en %.0f ms (%s)", os.getpid(), timer.total() * 1000, timer.summary())
+        try:
+            yield
+        finally:
+            await services.directory_events.stop()
+            await services.token_revocations.stop()
+            services.hasher.shutdown()
+            await dispose_engine()
+    return lifespan
+
+# Fábrica de la aplicación: no abre conexiones ni carga plantillas, así que
+# importar este módulo o crear una app para un script es barato.
+# `uvicorn main:app` usa la instancia por defecto; también vale `--factory main:create_app`.
+def create_app(settings: Settings = None) -> FastAPI:
+    settings = settings or Settings()
+    # orjson para todas las respuestas JSON (los modelos de respuesta validan y
+    # pydantic-core serializa; orjson solo codifica el resultado)
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=build_lifespan(settings))
+    app.include_router(router)
+
+    # Redirecciones lanzadas por las dependencias de autenticación
+    app.add_exception_handler(SessionRedirect, session_redirect_handler)
+    app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
+    # gzip/brotli para las respuestas dinámicas grandes (el directorio crece con los usuarios)
+    app.add_middleware(CompressionMiddleware)
+
+    # Límites de concurrencia por clase de ruta: 503 inmediato si la cola está llena
+    app.add_middleware(AdmissionMiddleware, control=admission_control, routes=app.router.routes)
+
+    # Latencia por ruta, peticiones en curso y consultas SQL por petición
+    # (incluye el tiempo de compresión)
+    app.add_middleware(MetricsMiddleware)
+
+    # Configuración de CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # CSS/JS: los de assets/dist (con huella) precomprimidos y con caché inmutable
+    app.mount("/assets", AssetFiles(directory="assets"), name="assets")
+    return app
+
+
+app = create_app()
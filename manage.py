@@ -0,0 +1,42 @@
+"""Tareas de administración de la aplicación.
+
+Uso (desde la raíz del proyecto):
+    python manage.py create-schema
+    python manage.py create-schema --database-url sqlite:///./otra.db
+    python manage.py build-assets
+"""
+import argparse
+import asyncio
+
+from config import DATABASE_URL
+from database import configure, create_schema, dispose_engine
+from static_assets import build_assets
+
+
+# Crea las tablas e índices que falten (ya no se hace al importar main)
+async def run_create_schema(database_url: str):
+    configure(database_url)
+    try:
+        await create_schema()
+    finally:
+        await dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    schema = commands.add_parser("create-schema", help="crea las tablas e índices que falten")
+    schema.add_argument("--database-url", default=DATABASE_URL)
+    commands.add_parser("build-assets", help="genera assets/dist: CSS/JS con huella y precomprimidos")
+    args = parser.parse_args()
+
+    if args.command == "create-schema":
+        asyncio.run(run_create_schema(args.database_url))
+        print("Esquema creado")
+    elif args.command == "build-assets":
+        manifest = build_assets()
+        print(f"{len(manifest)} assets en assets/dist")
+
+
+if __name__ == "__main__":
+    main()
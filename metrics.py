@@ -0,0 +1,278 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+
+# Métricas en formato de texto de Prometheus, sin dependencias externas.
+# Cada observación es una búsqueda binaria en los buckets y un incremento
+# bajo un lock sin contención, así que se puede dejar activo en producción.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # Por combinación de etiquetas: [contadores por bucket (+Inf al final), suma, total]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    # Mide la duración de un bloque: `with HISTOGRAM.time("etiqueta"):`
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def samples(self):
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = f'le="{le}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, bucket_label)} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class _Timer:
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        # Funciones que devuelven [(nombre, tipo, ayuda, [(etiquetas dict, valor)])]
+        # y se evalúan al exportar (estado del pool, cachés, etc.)
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    # `collectors`: colectores extra solo para esta exportación (los servicios de una app)
+    def render(self, collectors=()) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in [*self.collectors, *collectors]:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", ("method", "route", "status")))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Peticiones HTTP en curso"))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "db_query_duration_seconds", "Duración de cada consulta SQL",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)))
+DB_QUERIES_PER_REQUEST = registry.register(Histogram(
+    "db_queries_per_request", "Consultas SQL por petición HTTP", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)))
+DB_SECONDS_PER_REQUEST = registry.register(Histogram(
+    "db_time_per_request_seconds", "Tiempo total en consultas SQL por petición HTTP", ("route",)))
+DB_POOL_TIMEOUTS = registry.register(Counter(
+    "db_pool_timeouts_total", "Peticiones que agotaron pool_timeout esperando una conexión"))
+BCRYPT_SECONDS = registry.register(Histogram(
+    "bcrypt_duration_seconds", "Duración de hash/verify de bcrypt, incluida la espera en cola", ("operation",)))
+TEMPLATE_RENDER_SECONDS = registry.register(Histogram(
+    "template_render_duration_seconds", "Tiempo de renderizado de plantillas Jinja", ("template",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)))
+HTTP_COMPRESSION_BYTES = registry.register(Counter(
+    "http_compression_bytes_total", "Bytes de las respuestas comprimidas antes (in) y después (out)",
+    ("encoding", "stage")))
+ADMISSION_QUEUE_SECONDS = registry.register(Histogram(
+    "admission_queue_seconds", "Espera en la cola de admisión de las peticiones admitidas", ("class",),
+    buckets=(0.0, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+ADMISSION_SHED = registry.register(Counter(
+    "admission_shed_total", "Peticiones rechazadas con 503 por el control de admisión", ("class", "reason")))
+STARTUP_PHASE_SECONDS = registry.register(Gauge(
+    "app_startup_phase_seconds", "Duración de cada fase del arranque del worker", ("phase",)))
+JWT_SECONDS = registry.register(Histogram(
+    "jwt_duration_seconds", "Tiempo de firma y verificación de JWT", ("operation",),
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)))
+
+
+# Tiempos de las fases del arranque (lifespan): se publican en
+# app_startup_phase_seconds y se resumen en el log al terminar
+class StartupTimer:
+    def __init__(self):
+        self.phases = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = elapsed
+            STARTUP_PHASE_SECONDS.set(name, value=elapsed)
+
+    def total(self) -> float:
+        return time.perf_counter() - self._start
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items())
+
+
+# Contadores de SQL de la petición en curso. El ContextVar se copia al threadpool
+# y al greenlet de AsyncSession, así que los eventos del engine lo ven.
+class RequestDBStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+current_db_stats: ContextVar = ContextVar("current_db_stats", default=None)
+
+
+# Registra before/after_cursor_execute en el engine síncrono (también sirve en modo async)
+def instrument_engine(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        DB_QUERY_SECONDS.observe(elapsed)
+        stats = current_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+
+# Middleware ASGI puro (sin BaseHTTPMiddleware) que mide cada petición HTTP
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestDBStats()
+        token = current_db_stats.set(stats)
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            current_db_stats.reset(token)
+            route = route_label(scope)
+            HTTP_REQUEST_SECONDS.observe(elapsed, scope["method"], route, status_code)
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, route)
+            DB_SECONDS_PER_REQUEST.observe(stats.seconds, route)
+
+
+# Plantilla de la ruta (p. ej. /users/me/{user_id}) para no crear una serie por URL.
+# Los archivos estáticos se agrupan por el punto de montaje.
+def route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "<unknown>")
+    return scope.get("root_path") or "<unmatched>"
+
+
+# Mide el tiempo de renderizado de cada plantilla de un Jinja2Templates
+# (se envuelve la instancia para no importar Jinja al cargar este módulo)
+def instrument_templates(templates):
+    template_response = templates.TemplateResponse
+
+    def timed_template_response(*args, **kwargs):
+        name = kwargs.get("name") or next((arg for arg in args if isinstance(arg, str)), "<unknown>")
+        with TEMPLATE_RENDER_SECONDS.time(name):
+            return template_response(*args, **kwargs)
+
+    templates.TemplateResponse = timed_template_response
+    return templates
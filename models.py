@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Index, literal_column
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
+
+
+Base = declarative_base()
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+# Modelo de usuario en la base de datos
+class UserDB(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True)
+    hashed_password = Column(String)
+
+    # Relación uno a uno con user_details
+    user_details = relationship("UserDetailsDB", back_populates="user", uselist=False, passive_deletes=True)
+
+# Crear la clase para la tabla `user_details`
+class UserDetailsDB(Base):
+    __tablename__ = "user_details"
+    # Índices para búsquedas por prefijo y ordenación en /users/search
+    __table_args__ = (
+        Index("ix_user_details_last_first", "last_name", "first_name"),
+        Index("ix_user_details_first_last", "first_name", "last_name"),
+        Index("ix_user_details_location", "location"),
+    )
+    # Clave foránea explícita hacia users.id (al borrar el usuario se borran sus detalles)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True, index=True)
+    first_name = Column(String, nullable=False)
+    last_name = Column(String, nullable=False)
+    dob = Column(String)
+    location = Column(String)
+    bio = Column(String)
+    # Fecha de la última escritura (exportaciones incrementales)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, index=True)
+    # Versión de la fila para los ETag: empieza en 1 y cada UPDATE la incrementa
+    # en la propia sentencia (version = version + 1), sin carreras entre escrituras
+    version = Column(Integer, nullable=False, default=1, server_default="1",
+                     onupdate=literal_column("version") + 1)
+    # Recupera la versión nueva en el mismo flush (RETURNING o SELECT), así no
+    # queda expirada y no hay lazy load al leerla en modo async
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Relacionado con el usuario (clave foránea)
+    user = relationship("UserDB", back_populates="user_details")
+
+# Sesiones revocadas (logout) y cortes de "cerrar todas las sesiones" de un usuario.
+# Cada worker las carga en memoria y lee las nuevas periódicamente; las filas se
+# borran cuando ya no puede quedar ningún token válido al que afecten.
+class TokenRevocationDB(Base):
+    __tablename__ = "token_revocations"
+    id = Column(Integer, primary_key=True)
+    # jti de la sesión revocada, o NULL si se revocan todas las sesiones de `username`
+    jti = Column(String, index=True)
+    username = Column(String)
+    revoked_at = Column(Float, nullable=False, index=True)
+    expires_at = Column(Float, nullable=False, index=True)
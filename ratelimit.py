@@ -0,0 +1,103 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, status
+
+
+# Interfaz del almacén de contadores. La versión en memoria sirve para un solo
+# proceso; un backend compartido (p. ej. Redis con un script atómico) debe
+# implementar `hit` con la misma semántica para limitar entre workers.
+class CounterStore:
+    # Registra un intento para `key`. Devuelve (permitido, segundos hasta poder reintentar)
+    def hit(self, key: str, limit: int, window: float):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+# Contador de ventana deslizante aproximada: se guardan la ventana actual y la
+# anterior, y el intento se estima como anterior * fracción restante + actual.
+# La memoria está acotada a `max_keys` claves (se expulsa la usada hace más tiempo).
+class MemoryCounterStore(CounterStore):
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max(1, max_keys)
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def hit(self, key: str, limit: int, window: float, now: float = None):
+        now = time.time() if now is None else now
+        current_start = math.floor(now / window) * window
+
+        with self._lock:
+            start, current, previous = self._counters.get(key, (current_start, 0, 0))
+            if start != current_start:
+                # La ventana anterior solo cuenta si es la inmediatamente previa
+                previous = current if start == current_start - window else 0
+                current = 0
+                start = current_start
+
+            elapsed = (now - start) / window
+            estimated = previous * (1 - elapsed) + current
+            allowed = estimated < limit
+            if allowed:
+                current += 1
+
+            self._counters[key] = (start, current, previous)
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+                self.evictions += 1
+
+        retry_after = 0 if allowed else start + window - now
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        return {"keys": len(self._counters), "max_keys": self.max_keys, "evictions": self.evictions}
+
+
+# Limitador de intentos de contraseña por IP y por nombre de usuario.
+# Se consulta antes de calcular ningún hash, así un ataque de fuerza bruta
+# recibe 429 sin gastar CPU en bcrypt. Cuenta intentos, no fallos: un login
+# correcto no reinicia el contador (entrar en una cuenta propia no vacía el de la IP).
+class LoginRateLimiter:
+    def __init__(self, store: CounterStore, ip_limit: int, username_limit: int, window: float):
+        self.store = store
+        self.ip_limit = ip_limit
+        self.username_limit = username_limit
+        self.window = window
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, ip: str, username: str):
+        checks = (
+            (f"ip:{ip}", self.ip_limit),
+            (f"user:{username.strip().lower()}", self.username_limit),
+        )
+        for key, limit in checks:
+            allowed, retry_after = self.store.hit(key, limit, self.window)
+            if not allowed:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiados intentos, intente de nuevo más tarde",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "ip_limit": self.ip_limit,
+            "username_limit": self.username_limit,
+            "window_seconds": self.window,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "store": self.store.stats(),
+        }
+
+
+def client_ip(request) -> str:
+    return request.client.host if request.client else "unknown"
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import delete, insert, select
+
+from database import DBSession, new_session
+from models import TokenRevocationDB
+
+
+logger = logging.getLogger(__name__)
+
+
+# Revocaciones en memoria del proceso. La comprobación en cada petición son dos
+# búsquedas en diccionarios/conjuntos, sin consultas. Los jti se agrupan por el
+# minuto (bucket) en que caducan y se descartan por grupos enteros, así la
+# memoria solo guarda las sesiones revocadas que aún podrían usarse.
+class RevocationList:
+    def __init__(self, bucket_seconds: int = 60):
+        self.bucket_seconds = max(1, bucket_seconds)
+        self._tokens = set()
+        self._buckets = {}
+        # username -> (sesiones iniciadas antes de este instante no valen, caducidad)
+        self._users = {}
+
+    def add_token(self, jti: str, expires_at: float):
+        if jti in self._tokens:
+            return
+        self._tokens.add(jti)
+        self._buckets.setdefault(int(expires_at // self.bucket_seconds), set()).add(jti)
+
+    def add_user(self, username: str, cutoff: float, expires_at: float):
+        current = self._users.get(username)
+        if current is None or current[0] < cutoff:
+            self._users[username] = (cutoff, expires_at)
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        if jti is not None and jti in self._tokens:
+            return True
+        cutoff = self._users.get(payload.get("sub"))
+        # Los tokens antiguos sin auth_time cuentan desde su iat
+        return cutoff is not None and payload.get("auth_time", payload.get("iat", 0)) < cutoff[0]
+
+    def prune(self, now: float):
+        current_bucket = int(now // self.bucket_seconds)
+        for bucket in [b for b in self._buckets if b < current_bucket]:
+            self._tokens.difference_update(self._buckets.pop(bucket))
+        for username in [u for u, (_, expires_at) in self._users.items() if expires_at < now]:
+            del self._users[username]
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._tokens), "users": len(self._users), "buckets": len(self._buckets)}
+
+
+def insert_revocation(db, jti, username, revoked_at: float, expires_at: float):
+    # Una sesión ya revocada (p. ej. por otro worker) no se vuelve a insertar
+    if jti is not None and db.execute(
+        select(TokenRevocationDB.id).where(TokenRevocationDB.jti == jti).limit(1)
+    ).first() is not None:
+        return
+    db.execute(insert(TokenRevocationDB).values(
+        jti=jti, username=username, revoked_at=revoked_at, expires_at=expires_at
+    ))
+    db.commit()
+
+def load_revocations(db, since: float, now: float):
+    return db.execute(
+        select(TokenRevocationDB.jti, TokenRevocationDB.username,
+               TokenRevocationDB.revoked_at, TokenRevocationDB.expires_at)
+        .where(TokenRevocationDB.revoked_at >= since, TokenRevocationDB.expires_at > now)
+    ).all()
+
+def delete_expired_revocations(db, now: float):
+    db.execute(delete(TokenRevocationDB).where(TokenRevocationDB.expires_at <= now))
+    db.commit()
+
+
+# Revocaciones compartidas entre workers: se escriben en la tabla
+# token_revocations y cada worker lee las nuevas cada `poll_seconds`.
+# El worker que revoca la aplica en memoria al momento; los demás, en el
+# siguiente sondeo.
+class TokenRevocations:
+    def __init__(self, revocations: RevocationList, window_seconds: int, poll_seconds: float):
+        self.revocations = revocations
+        self.window_seconds = window_seconds
+        self.poll_seconds = poll_seconds
+        self._synced_at = None
+        self._cleaned_at = 0.0
+        self._task = None
+        self.polls = 0
+
+    def is_revoked(self, payload: dict) -> bool:
+        return self.revocations.is_revoked(payload)
+
+    # Logout: revoca la sesión del token (todas sus renovaciones comparten jti)
+    async def revoke_session(self, db, payload: dict):
+        jti = payload.get("jti")
+        # Logouts repetidos con el mismo token: la sesión ya está revocada
+        if not jti or self.revocations.is_revoked(payload):
+            return
+        now = time.time()
+        expires_at = now + self.window_seconds
+        self.revocations.add_token(jti, expires_at)
+        await db.run(insert_revocation, jti, payload.get("sub"), now, expires_at)
+
+    # Cierra todas las sesiones abiertas del usuario hasta este momento
+    async def revoke_all(self, db, username: str):
+        now = time.time()
+        expires_at = now + self.window_seconds
+        self.revocations.add_user(username, now, expires_at)
+        await db.run(insert_revocation, None, username, now, expires_at)
+
+    # Lee las revocaciones nuevas. Se vuelve a pedir un margen de dos sondeos
+    # para no perder filas confirmadas tarde; aplicarlas dos veces no cambia nada.
+    async def sync(self):
+        now = time.time()
+        since = 0.0 if self._synced_at is None else self._synced_at - 2 * self.poll_seconds
+        db = DBSession(new_session())
+        try:
+            rows = await db.run(load_revocations, since, now)
+            if now - self._cleaned_at >= self.revocations.bucket_seconds:
+                await db.run(delete_expired_revocations, now)
+                self._cleaned_at = now
+        finally:
+            await db.close()
+
+        for jti, username, revoked_at, expires_at in rows:
+            if jti is not None:
+                self.revocations.add_token(jti, expires_at)
+            else:
+                self.revocations.add_user(username, revoked_at, expires_at)
+        self.revocations.prune(now)
+        self._synced_at = now
+        self.polls += 1
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("No se pudieron leer las revocaciones de sesión")
+
+    # Carga inicial completa y sondeo periódico en segundo plano
+    async def start(self):
+        await self.sync()
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {**self.revocations.stats(), "polls": self.polls, "poll_seconds": self.poll_seconds}
@@ -0,0 +1,79 @@
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+# Modelos de respuesta de las rutas JSON. Con from_attributes se validan
+# directamente desde objetos ORM o filas de SQLAlchemy, sin pasar por dicts.
+
+class Message(BaseModel):
+    message: str
+
+class UserDetailsOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    user_id: int
+    first_name: str
+    last_name: str
+    dob: Optional[str] = None
+    location: Optional[str] = None
+    bio: Optional[str] = None
+
+# Fila de /users/search (LEFT JOIN: los detalles pueden faltar)
+class UserSearchItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    username: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    dob: Optional[str] = None
+    location: Optional[str] = None
+    bio: Optional[str] = None
+
+class UserSearchPage(BaseModel):
+    items: list[UserSearchItem]
+    page: int
+    page_size: int
+    next_page: Optional[int] = None
+    backend: str
+
+class BulkRowError(BaseModel):
+    row: int
+    username: Optional[str] = None
+    error: str
+
+class BulkImportStats(BaseModel):
+    rows: int
+    created: int
+    failed: int
+    batch_size: int
+    elapsed_seconds: float
+    rows_per_second: float
+    hash_seconds: float
+    insert_seconds: float
+
+class BulkImportResult(BaseModel):
+    message: str
+    errors: list[BulkRowError]
+    stats: BulkImportStats
+
+# Resultado de cada elemento de /users/batch (en el orden de la petición):
+# updated, deleted, not_found o invalid
+class BatchItemResult(BaseModel):
+    id: int
+    status: str
+    error: Optional[str] = None
+
+class BatchStats(BaseModel):
+    items: int
+    applied: int
+    failed: int
+    chunk_size: int
+    statements: int
+    elapsed_seconds: float
+
+class BatchResult(BaseModel):
+    message: str
+    results: list[BatchItemResult]
+    stats: BatchStats
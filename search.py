@@ -0,0 +1,175 @@
+from sqlalchemy import column, or_, select, table, text
+
+from etag import row_version, rows_etag
+from models import UserDB, UserDetailsDB
+
+
+# Campos por los que se puede buscar y columnas por las que se puede ordenar
+SEARCH_FIELDS = {
+    "name": (UserDetailsDB.first_name, UserDetailsDB.last_name),
+    "email": (UserDB.username,),
+    "location": (UserDetailsDB.location,),
+}
+SORT_COLUMNS = {
+    "id": UserDB.id,
+    "username": UserDB.username,
+    "first_name": UserDetailsDB.first_name,
+    "last_name": UserDetailsDB.last_name,
+    "location": UserDetailsDB.location,
+}
+RESULT_COLUMNS = (
+    UserDB.id, UserDB.username, UserDetailsDB.first_name, UserDetailsDB.last_name,
+    UserDetailsDB.dob, UserDetailsDB.location, UserDetailsDB.bio,
+)
+RESULT_KEYS = tuple(col.key for col in RESULT_COLUMNS)
+VERSION_COLUMNS = (UserDB.id, UserDetailsDB.version, UserDetailsDB.updated_at)
+
+
+def like_pattern(q: str, mode: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if mode == "prefix" else f"%{escaped}%"
+
+
+# Búsqueda con LIKE sobre los índices B-tree. Las búsquedas por prefijo usan
+# los índices compuestos (en MySQL, con collation sin distinción de mayúsculas);
+# las de subcadena recorren la tabla, para eso están los backends de texto completo.
+class LikeSearchBackend:
+    name = "like"
+
+    def condition(self, q: str, fields: list, mode: str):
+        pattern = like_pattern(q, mode)
+        return or_(*(col.like(pattern, escape="\\") for field in fields for col in SEARCH_FIELDS[field]))
+
+    def install(self, connection):
+        pass
+
+
+# SQLite FTS5 con tokenizador trigram: admite LIKE de prefijo y de subcadena
+# usando el índice de texto completo. La tabla `user_search` (rowid = id del
+# usuario) se mantiene con triggers sobre users y user_details.
+FTS_COLUMNS = {"name": ("first_name", "last_name"), "email": ("username",), "location": ("location",)}
+user_search = table("user_search", column("rowid"), column("username"), column("first_name"),
+                    column("last_name"), column("location"))
+
+class SQLiteFTSBackend:
+    name = "sqlite-fts5"
+
+    def condition(self, q: str, fields: list, mode: str):
+        # Con ESCAPE SQLite deja de usar el índice trigram, así que el patrón va sin
+        # escapar: se quita `%` y `_` actúa como comodín de un carácter (resultado algo más amplio)
+        q = q.replace("%", "")
+        pattern = f"{q}%" if mode == "prefix" else f"%{q}%"
+        matches = or_(*(user_search.c[name].like(pattern) for field in fields for name in FTS_COLUMNS[field]))
+        return UserDB.id.in_(select(user_search.c.rowid).where(matches))
+
+    def install(self, connection):
+        exists = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'user_search'"
+        ).first()
+        if exists:
+            return
+        for statement in (
+            "CREATE VIRTUAL TABLE user_search USING fts5(username, first_name, last_name, location, tokenize='trigram')",
+            "INSERT INTO user_search(rowid, username, first_name, last_name, location) "
+            "SELECT u.id, u.username, d.first_name, d.last_name, d.location "
+            "FROM users u LEFT JOIN user_details d ON d.user_id = u.id",
+            "CREATE TRIGGER user_search_users_ai AFTER INSERT ON users BEGIN "
+            "INSERT INTO user_search(rowid, username) VALUES (new.id, new.username); END",
+            "CREATE TRIGGER user_search_users_au AFTER UPDATE OF username ON users BEGIN "
+            "UPDATE user_search SET username = new.username WHERE rowid = new.id; END",
+            "CREATE TRIGGER user_search_users_ad AFTER DELETE ON users BEGIN "
+            "DELETE FROM user_search WHERE rowid = old.id; END",
+            "CREATE TRIGGER user_search_details_ai AFTER INSERT ON user_details BEGIN "
+            "UPDATE user_search SET first_name = new.first_name, last_name = new.last_name, "
+            "location = new.location WHERE rowid = new.user_id; END",
+            "CREATE TRIGGER user_search_details_au AFTER UPDATE ON user_details BEGIN "
+            "UPDATE user_search SET first_name = new.first_name, last_name = new.last_name, "
+            "location = new.location WHERE rowid = new.user_id; END",
+            "CREATE TRIGGER user_search_details_ad AFTER DELETE ON user_details BEGIN "
+            "UPDATE user_search SET first_name = NULL, last_name = NULL, location = NULL "
+            "WHERE rowid = old.user_id; END",
+        ):
+            connection.exec_driver_sql(statement)
+
+
+# MySQL FULLTEXT en modo booleano: cada palabra se busca como prefijo (`palabra*`).
+# FULLTEXT no resuelve subcadenas arbitrarias, así que ese modo usa LIKE.
+MYSQL_FULLTEXT_INDEXES = {
+    "ft_user_details_name": ("user_details", ("first_name", "last_name")),
+    "ft_user_details_location": ("user_details", ("location",)),
+    "ft_users_username": ("users", ("username",)),
+}
+
+class MySQLFullTextBackend(LikeSearchBackend):
+    name = "mysql-fulltext"
+
+    def condition(self, q: str, fields: list, mode: str):
+        from sqlalchemy.dialects.mysql import match
+
+        words = [w.strip('+-><()~*"@') for w in q.split()]
+        terms = " ".join(f"+{w}*" for w in words if w)
+        if mode != "prefix" or not terms:
+            return super().condition(q, fields, mode)
+        return or_(*(match(*SEARCH_FIELDS[field], against=terms).in_boolean_mode() for field in fields))
+
+    def install(self, connection):
+        existing = {
+            row[0] for row in connection.execute(text(
+                "SELECT DISTINCT index_name FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND index_type = 'FULLTEXT'"
+            ))
+        }
+        for name, (table_name, columns) in MYSQL_FULLTEXT_INDEXES.items():
+            if name not in existing:
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table_name} ADD FULLTEXT INDEX {name} ({', '.join(columns)})"
+                )
+
+
+# Backend según la configuración (SEARCH_BACKEND=like|fts) y el motor de base de datos
+def get_search_backend(kind: str, dialect_name: str):
+    if kind == "fts":
+        if dialect_name == "sqlite":
+            return SQLiteFTSBackend()
+        if dialect_name in ("mysql", "mariadb"):
+            return MySQLFullTextBackend()
+    return LikeSearchBackend()
+
+
+# Consulta de una página (page empieza en 1). Se pide una fila de más para saber si hay siguiente página.
+def search_statement(backend, columns, q: str, fields: list, mode: str, sort: str, descending: bool,
+                     page: int, page_size: int):
+    sort_column = SORT_COLUMNS[sort]
+    order = (sort_column.desc(), UserDB.id.desc()) if descending else (sort_column.asc(), UserDB.id.asc())
+    return (
+        select(*columns)
+        .select_from(UserDB)
+        .outerjoin(UserDB.user_details)
+        .where(backend.condition(q, fields, mode))
+        .order_by(*order)
+        .offset((page - 1) * page_size)
+        .limit(page_size + 1)
+    )
+
+# ETag de la página con la misma consulta pero leyendo solo (id, versión, updated_at)
+def search_etag(db, backend, q: str, fields: list, mode: str, sort: str, descending: bool,
+                page: int, page_size: int):
+    stmt = search_statement(backend, VERSION_COLUMNS, q, fields, mode, sort, descending, page, page_size)
+    return rows_etag((row.id, row_version(row.version, row.updated_at)) for row in db.execute(stmt))
+
+# Búsqueda paginada. El ETag se calcula con las mismas filas que se devuelven.
+# Los items se arman directamente desde las tuplas (la versión y updated_at,
+# últimas columnas, quedan fuera del zip), listos para serializar con orjson.
+def search_users(db, backend, q: str, fields: list, mode: str, sort: str, descending: bool,
+                 page: int, page_size: int):
+    columns = RESULT_COLUMNS + (UserDetailsDB.version, UserDetailsDB.updated_at)
+    rows = db.execute(search_statement(backend, columns, q, fields, mode, sort, descending, page, page_size)).all()
+    items = [dict(zip(RESULT_KEYS, row)) for row in rows[:page_size]]
+    return {
+        "items": items,
+        "page": page,
+        "page_size": page_size,
+        "next_page": page + 1 if len(rows) > page_size else None,
+        "backend": backend.name,
+        "etag": rows_etag((row.id, row_version(row.version, row.updated_at)) for row in rows),
+    }
@@ -0,0 +1,139 @@
+"""Lanzador de producción: varios workers de uvicorn con la configuración repartida.
+
+Antes de arrancar los workers:
+  - elige el número de workers según los núcleos disponibles (o WEB_CONCURRENCY),
+  - reparte DB_MAX_CONNECTIONS entre ellos (DB_POOL_SIZE y DB_MAX_OVERFLOW),
+  - reparte los núcleos entre los pools de bcrypt (HASH_WORKERS),
+  - calibra bcrypt una sola vez (BCRYPT_ROUNDS igual en todos los workers),
+  - crea el esquema una sola vez si CREATE_SCHEMA_ON_STARTUP está activo
+    (en cada worker a la vez, los CREATE TABLE chocarían entre sí).
+Cada worker abre su pool y compila las plantillas antes de aceptar peticiones.
+
+Uso (desde la raíz del proyecto):
+    python serve.py
+    python serve.py --workers 8 --db-max-connections 150 --port 8000
+    python serve.py --dry-run
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+
+import uvicorn
+from uvicorn.config import LOGGING_CONFIG
+
+from config import (
+    DATABASE_URL, WEB_CONCURRENCY, DB_MAX_CONNECTIONS, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    BCRYPT_ROUNDS, BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS, CREATE_SCHEMA_ON_STARTUP,
+)
+from hashing import calibrate_bcrypt_rounds
+from manage import run_create_schema
+
+
+logger = logging.getLogger("serve")
+
+
+# Núcleos que puede usar este proceso (respeta taskset/cpuset de contenedores)
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Reparte el presupuesto de conexiones a la base de datos entre los workers:
+# un tercio fijo en el pool y el resto como desbordamiento (la misma proporción
+# que 10 + 20). Con budget=0 se mantiene la configuración de cada worker.
+def split_connections(budget: int, workers: int) -> tuple:
+    if not budget:
+        return DB_POOL_SIZE, DB_MAX_OVERFLOW
+    per_worker = budget // workers
+    if per_worker < 1:
+        raise ValueError(f"DB_MAX_CONNECTIONS={budget} no alcanza para {workers} workers")
+    pool_size = max(1, per_worker // 3)
+    return pool_size, per_worker - pool_size
+
+
+# Variables de entorno que heredan los workers (uvicorn los arranca con spawn:
+# no comparten memoria con este proceso, solo el entorno)
+def plan(workers: int, db_max_connections: int, cpus: int) -> dict:
+    pool_size, max_overflow = split_connections(db_max_connections, workers)
+    env = {
+        "DB_POOL_SIZE": str(pool_size),
+        "DB_MAX_OVERFLOW": str(max_overflow),
+        "WARMUP_ON_STARTUP": "true",
+    }
+    # bcrypt usa un hilo por núcleo y worker: sin repartirlos, N workers
+    # lanzarían N veces más hashes a la vez que núcleos hay
+    if "HASH_WORKERS" not in os.environ:
+        env["HASH_WORKERS"] = str(max(1, cpus // workers))
+    return {
+        "workers": workers,
+        "cpus": cpus,
+        "db_connections_per_worker": pool_size + max_overflow,
+        "db_connections_total": workers * (pool_size + max_overflow),
+        "env": env,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY,
+                        help="workers de uvicorn (0 = uno por núcleo disponible)")
+    parser.add_argument("--db-max-connections", type=int, default=DB_MAX_CONNECTIONS,
+                        help="conexiones a la base de datos entre todos los workers (0 = sin límite global)")
+    parser.add_argument("--graceful-timeout", type=float, default=10,
+                        help="segundos de espera a las peticiones en curso al parar (incluye /users/events)")
+    parser.add_argument("--dry-run", action="store_true", help="muestra la configuración calculada y termina")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    started = time.perf_counter()
+    cpus = available_cpus()
+    workers = args.workers or cpus
+    try:
+        settings = plan(workers, args.db_max_connections, cpus)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    # Calibración única: todos los workers usan el mismo coste y no compiten
+    # por la CPU calibrando a la vez al arrancar
+    if BCRYPT_ROUNDS is None:
+        calibration = calibrate_bcrypt_rounds(BCRYPT_TARGET_MS / 1000, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS)
+        settings["env"]["BCRYPT_ROUNDS"] = str(calibration["rounds"])
+        settings["bcrypt_calibration_ms"] = round((time.perf_counter() - started) * 1000)
+
+    if args.dry_run:
+        print(json.dumps(settings, indent=2))
+        return
+
+    if CREATE_SCHEMA_ON_STARTUP:
+        asyncio.run(run_create_schema(DATABASE_URL))
+        settings["env"]["CREATE_SCHEMA_ON_STARTUP"] = "false"
+
+    os.environ.update(settings["env"])
+    logger.info(
+        "%s workers (%s núcleos), %s conexiones por worker (%s en total), bcrypt %s rondas; preparado en %.0f ms",
+        workers, cpus, settings["db_connections_per_worker"], settings["db_connections_total"],
+        os.environ.get("BCRYPT_ROUNDS"), (time.perf_counter() - started) * 1000,
+    )
+
+    # El log de uvicorn más los registros INFO de la aplicación (tiempos de arranque de cada worker)
+    log_config = copy.deepcopy(LOGGING_CONFIG)
+    log_config["root"] = {"handlers": ["default"], "level": "INFO"}
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        log_config=log_config,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from passlib.context import CryptContext
+from starlette.requests import Request
+
+from config import (
+    HASH_WORKERS, HASH_QUEUE_SIZE, LOGIN_LIMIT_PER_IP, LOGIN_LIMIT_PER_USERNAME, LOGIN_LIMIT_WINDOW,
+    RATE_LIMIT_MAX_KEYS, PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL, DIRECTORY_CACHE_MAX_BYTES, DIRECTORY_CACHE_TTL,
+    SESSION_WINDOW_SECONDS, REVOCATION_POLL_SECONDS, REVOCATION_BUCKET_SECONDS, EVENTS_CLIENT_BUFFER,
+    EVENTS_MAX_CLIENTS, EVENTS_REPLAY_SIZE, EVENTS_HEARTBEAT_SECONDS, EVENTS_MAX_STREAM_SECONDS,
+)
+from cache import LRUCache, ProfileCache, FragmentCache
+from events import EventHub, MemoryEventBackend
+from hashing import PasswordHasher
+from ratelimit import LoginRateLimiter, MemoryCounterStore
+from revocation import RevocationList, TokenRevocations
+
+
+# Servicios en memoria de una aplicación. El lifespan de cada create_app()
+# crea los suyos y al apagar solo para esos: otra app del mismo proceso
+# (tests, scripts) no hereda un pool de bcrypt cerrado ni cachés ajenas.
+class Services:
+    def __init__(self):
+        self.hasher = PasswordHasher(
+            CryptContext(schemes=["bcrypt"], deprecated="auto"), workers=HASH_WORKERS, queue_size=HASH_QUEUE_SIZE
+        )
+        self.login_limiter = LoginRateLimiter(
+            MemoryCounterStore(RATE_LIMIT_MAX_KEYS),
+            ip_limit=LOGIN_LIMIT_PER_IP,
+            username_limit=LOGIN_LIMIT_PER_USERNAME,
+            window=LOGIN_LIMIT_WINDOW,
+        )
+        self.profile_cache = ProfileCache(LRUCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL))
+        self.directory_cache = FragmentCache(DIRECTORY_CACHE_MAX_BYTES, DIRECTORY_CACHE_TTL)
+        # Un token renovado conserva el jti de la sesión, así que tras revocarla el
+        # último token de esa cadena caduca como mucho una ventana después
+        self.token_revocations = TokenRevocations(
+            RevocationList(REVOCATION_BUCKET_SECONDS), SESSION_WINDOW_SECONDS, REVOCATION_POLL_SECONDS
+        )
+        self.directory_events = EventHub(
+            MemoryEventBackend(), EVENTS_CLIENT_BUFFER, EVENTS_MAX_CLIENTS, EVENTS_REPLAY_SIZE,
+            EVENTS_HEARTBEAT_SECONDS, EVENTS_MAX_STREAM_SECONDS,
+        )
+
+
+# Dependencia: servicios de la aplicación que atiende la petición
+def get_services(request: Request) -> Services:
+    return request.app.state.services
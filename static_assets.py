@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import stat
+from functools import lru_cache
+
+import brotli
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from compression import ENCODING_SUFFIXES, negotiate_encoding
+
+
+# Assets con huella: `python manage.py build-assets` copia assets/css y assets/js
+# a assets/dist con el hash del contenido en el nombre (style_show.1a2b3c4d5e6f.css),
+# junto a sus versiones .gz y .br, y escribe un manifiesto nombre original -> nombre
+# con huella. Como el nombre cambia con el contenido, se pueden cachear para siempre.
+ASSETS_DIR = "assets"
+ASSETS_URL = "/assets"
+DIST_DIR = "dist"
+FINGERPRINT_DIRS = ("css", "js")
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=6).hexdigest()
+
+
+# Solo se guardan las versiones comprimidas que ocupan menos que el original
+def write_precompressed(path: str, data: bytes):
+    variants = {
+        ".gz": gzip.compress(data, compresslevel=9, mtime=0),
+        ".br": brotli.compress(data, quality=11),
+    }
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(compressed)
+
+
+def build_assets(root: str = ASSETS_DIR) -> dict:
+    dist = os.path.join(root, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {}
+    for folder in FINGERPRINT_DIRS:
+        source_dir = os.path.join(root, folder)
+        if not os.path.isdir(source_dir):
+            continue
+        os.makedirs(os.path.join(dist, folder))
+        for name in sorted(os.listdir(source_dir)):
+            with open(os.path.join(source_dir, name), "rb") as f:
+                data = f.read()
+            stem, ext = os.path.splitext(name)
+            target = f"{DIST_DIR}/{folder}/{stem}.{fingerprint(data)}{ext}"
+            with open(os.path.join(root, target), "wb") as f:
+                f.write(data)
+            write_precompressed(os.path.join(root, target), data)
+            manifest[f"{folder}/{name}"] = target
+
+    with open(os.path.join(dist, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    load_manifest.cache_clear()
+    return manifest
+
+
+# Sin build (desarrollo) el manifiesto está vacío y se sirven los archivos originales
+@lru_cache(maxsize=None)
+def load_manifest(root: str = ASSETS_DIR) -> dict:
+    try:
+        with open(os.path.join(root, DIST_DIR, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# Función de Jinja: {{ asset_url('css/style_show.css') }}
+def asset_url(path: str) -> str:
+    return f"{ASSETS_URL}/{load_manifest().get(path, path)}"
+
+
+# /assets: los archivos de dist/ se sirven precomprimidos (.br o .gz según
+# Accept-Encoding) y cacheables para siempre; los originales, con revalidación.
+class AssetFiles(StaticFiles):
+    async def get_response(self, path: str, scope):
+        fingerprinted = path.startswith(DIST_DIR + "/")
+        response = None
+        if fingerprinted and scope["method"] in ("GET", "HEAD"):
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+            if encoding is not None:
+                full_path, stat_result = await run_in_threadpool(self.lookup_path, path + ENCODING_SUFFIXES[encoding])
+                if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+                    # El tipo se deduce del nombre sin la extensión .br/.gz
+                    response = self.file_response(full_path, stat_result, scope)
+                    if response.status_code == 200:
+                        response.headers["Content-Encoding"] = encoding
+
+        if response is None:
+            response = await super().get_response(path, scope)
+        if fingerprinted:
+            response.headers["Cache-Control"] = IMMUTABLE
+            response.headers.add_vary_header("Accept-Encoding")
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
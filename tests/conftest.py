@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Los módulos de la aplicación están en la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py lee el entorno al importarse: valores mínimos para los tests
+os.environ.setdefault("SECRET_KEY", "x" * 32)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+
+from config import Settings
+
+
+def make_client(tmp_path):
+    import main
+
+    app = main.create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True))
+    return TestClient(app, base_url="https://testserver")
+
+
+def login(client, username="ana@example.com"):
+    client.post("/users/me/create", json={
+        "user": {"username": username, "hashed_password": "secreta"},
+        "user_details": {"first_name": "Ana", "last_name": "García"},
+    })
+    assert client.post("/token", data={"username": username, "password": "secreta"}).status_code == 200
+
+
+# Una sesión cuyo usuario ya no existe vuelve al inicio y borra la cookie,
+# en lugar de rebotar entre / y /users/me
+def test_deleted_user_session_returns_to_index(tmp_path):
+    with make_client(tmp_path) as client:
+        login(client)
+        assert client.delete("/users/me/1").status_code == 200
+
+        response = client.get("/")
+        assert response.status_code == 200
+        assert response.url.path == "/"
+        assert "access_token" not in client.cookies
+
+
+def test_invalid_token_cookie_is_cleared(tmp_path):
+    with make_client(tmp_path) as client:
+        client.cookies.set("access_token", "no-es-un-jwt", domain="testserver")
+        response = client.get("/users/me", follow_redirects=False)
+        assert response.status_code == 302
+        assert 'access_token=""' in response.headers["set-cookie"]
+        assert client.get("/").url.path == "/"
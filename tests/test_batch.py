@@ -0,0 +1,107 @@
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy import create_engine, delete, insert, select
+
+from config import LOGIN_LIMIT_PER_IP, Settings
+from models import Base, UserDB, UserDetailsDB
+
+PASSWORD = "secreta"
+# Más usuarios que intentos permite el limitador por IP en una ventana
+USERS = LOGIN_LIMIT_PER_IP + 10
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    hashed = CryptContext(schemes=["bcrypt"]).hash(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(UserDB), [
+            {"id": i, "username": f"user{i}@example.com", "hashed_password": hashed} for i in range(1, USERS + 1)
+        ])
+        conn.execute(insert(UserDetailsDB), [
+            {"user_id": i, "first_name": f"Nombre{i}", "last_name": "Apellido"} for i in range(1, USERS + 1)
+        ])
+    yield url, engine
+    engine.dispose()
+
+
+@pytest.fixture
+def client(database):
+    import main
+
+    app = main.create_app(Settings(database_url=database[0], create_schema=False))
+    with TestClient(app, base_url="https://testserver") as client:
+        assert client.post("/token", data={"username": "user1@example.com", "password": PASSWORD}).status_code == 200
+        yield client
+
+
+def locations(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(UserDetailsDB.user_id, UserDetailsDB.location)).all())
+
+
+# Una sola comprobación de la contraseña por petición: un lote mayor que el
+# límite de intentos por IP se aplica entero
+def test_batch_update_larger_than_ip_limit(client, database):
+    services = client.app.state.services
+    allowed = services.login_limiter.stats()["allowed"]
+    items = [{"id": i, "location": "Lima"} for i in range(1, USERS + 1)]
+
+    response = client.patch("/users/batch", json={"current_password": PASSWORD, "items": items})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["status"] for result in body["results"]] == ["updated"] * USERS
+    assert body["stats"]["applied"] == USERS
+    assert services.login_limiter.stats()["allowed"] == allowed + 1
+    assert set(locations(database[1]).values()) == {"Lima"}
+
+
+def test_batch_update_results_follow_items(client, database):
+    _, engine = database
+    with engine.begin() as conn:
+        conn.execute(delete(UserDetailsDB).where(UserDetailsDB.user_id == 3))
+    items = [
+        {"id": 2, "location": "Lima"},
+        {"id": 4, "bio": "a"},
+        {"id": 4, "bio": "b"},
+        {"id": 3, "bio": "sin detalles"},
+        {"id": 999, "bio": "no existe"},
+        {"id": 5},
+    ]
+    response = client.patch("/users/batch", json={"current_password": PASSWORD, "items": items})
+
+    assert [(r["id"], r["status"]) for r in response.json()["results"]] == [
+        (2, "updated"), (4, "invalid"), (4, "invalid"), (3, "not_found"), (999, "not_found"), (5, "invalid"),
+    ]
+
+
+def test_batch_operations_require_caller_password(client, database):
+    _, engine = database
+    response = client.patch("/users/batch", json={
+        "current_password": "incorrecta", "items": [{"id": 2, "location": "Lima"}],
+    })
+    assert response.status_code == 400
+    assert locations(engine)[2] is None
+
+    response = client.post("/users/batch/delete", json={"current_password": "incorrecta", "ids": [2]})
+    assert response.status_code == 400
+    assert client.post("/users/batch/delete", json={"ids": [2]}).status_code == 422
+
+    response = client.post("/users/batch/delete", json={"current_password": PASSWORD, "ids": [2, 3, 999]})
+    assert [r["status"] for r in response.json()["results"]] == ["deleted", "deleted", "not_found"]
+
+
+# El limitador rechaza la petición entera (429), no usuario por usuario
+def test_batch_rate_limited_request(client):
+    limit = client.app.state.services.login_limiter.username_limit
+    payload = {"current_password": "incorrecta", "items": [{"id": 2, "location": "Lima"}]}
+    for _ in range(limit - 1):
+        assert client.patch("/users/batch", json=payload).status_code == 400
+
+    response = client.patch("/users/batch", json=payload)
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
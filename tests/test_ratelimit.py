@@ -0,0 +1,115 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from config import Settings
+from ratelimit import LoginRateLimiter, MemoryCounterStore
+
+
+# Almacén en memoria con el reloj fijado por el test
+class FixedClockStore(MemoryCounterStore):
+    def __init__(self, now: float, max_keys: int = 100000):
+        super().__init__(max_keys)
+        self.now = now
+
+    def hit(self, key: str, limit: int, window: float, now: float = None):
+        return super().hit(key, limit, window, self.now)
+
+
+def test_hit_rejects_over_limit_until_window_ends():
+    store = MemoryCounterStore()
+    assert store.hit("k", 2, 10, now=100) == (True, 0)
+    assert store.hit("k", 2, 10, now=101) == (True, 0)
+    assert store.hit("k", 2, 10, now=102) == (False, 8)
+
+
+def test_hit_window_rollover_weights_previous_window():
+    store = MemoryCounterStore()
+    store.hit("k", 2, 10, now=100)
+    store.hit("k", 2, 10, now=101)
+    # Al empezar la ventana siguiente aún cuentan los 2 intentos anteriores
+    assert store.hit("k", 2, 10, now=110) == (False, 10)
+    # A mitad de ventana pesan la mitad: 2 * 0.5 = 1 < 2
+    assert store.hit("k", 2, 10, now=115) == (True, 0)
+    # 1 (anterior) + 1 (actual) = 2: rechazado
+    assert store.hit("k", 2, 10, now=115) == (False, 5)
+
+
+def test_hit_forgets_windows_older_than_the_previous_one():
+    store = MemoryCounterStore()
+    store.hit("k", 1, 10, now=100)
+    assert store.hit("k", 1, 10, now=105)[0] is False
+    # Una ventana entera sin intentos: la de 100-110 ya no cuenta
+    assert store.hit("k", 1, 10, now=120) == (True, 0)
+
+
+def test_lru_eviction_at_capacity():
+    store = MemoryCounterStore(max_keys=2)
+    store.hit("a", 1, 60, now=0)
+    store.hit("b", 1, 60, now=0)
+    store.hit("a", 1, 60, now=1)  # "a" pasa a ser la usada más recientemente
+    store.hit("c", 1, 60, now=2)  # expulsa "b"
+    assert store.stats() == {"keys": 2, "max_keys": 2, "evictions": 1}
+    # "a" conserva su contador; "b" empieza de cero
+    assert store.hit("a", 1, 60, now=3)[0] is False
+    assert store.hit("b", 1, 60, now=3) == (True, 0)
+
+
+def test_limiter_rejects_with_retry_after():
+    limiter = LoginRateLimiter(FixedClockStore(1030), ip_limit=10, username_limit=3, window=60)
+    for _ in range(3):
+        limiter.check("10.0.0.1", "ana@example.com")
+    with pytest.raises(HTTPException) as exc:
+        # Las variantes de mayúsculas y espacios cuentan como el mismo usuario
+        limiter.check("10.0.0.2", " Ana@Example.com")
+    assert exc.value.status_code == 429
+    # La ventana empezó en 1020: se puede reintentar a los 1080
+    assert exc.value.headers == {"Retry-After": "50"}
+    assert limiter.stats()["allowed"] == 3
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_limiter_limits_by_ip_across_usernames():
+    limiter = LoginRateLimiter(FixedClockStore(0), ip_limit=3, username_limit=10, window=60)
+    for number in range(3):
+        limiter.check("10.0.0.1", f"user{number}@example.com")
+    with pytest.raises(HTTPException):
+        limiter.check("10.0.0.1", "otro@example.com")
+    limiter.check("10.0.0.2", "otro@example.com")
+
+
+def test_retry_after_is_at_least_one_second():
+    limiter = LoginRateLimiter(FixedClockStore(59.9), ip_limit=10, username_limit=1, window=60)
+    limiter.check("10.0.0.1", "ana@example.com")
+    with pytest.raises(HTTPException) as exc:
+        limiter.check("10.0.0.1", "ana@example.com")
+    assert exc.value.headers == {"Retry-After": "1"}
+
+
+# /token: el 429 llega antes de calcular ningún hash, y un login correcto no
+# reinicia el contador (cuenta intentos, no fallos: si no, entrar en una cuenta
+# propia serviría para vaciar el contador de la IP)
+def test_token_route_returns_429_without_hashing(tmp_path):
+    import main
+
+    app = main.create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True))
+    with TestClient(app, base_url="https://testserver") as client:
+        client.post("/users/me/create", json={
+            "user": {"username": "ana@example.com", "hashed_password": "secreta"},
+            "user_details": {"first_name": "Ana", "last_name": "García"},
+        })
+        services = app.state.services
+        limit = services.login_limiter.username_limit
+
+        def login(password):
+            return client.post("/token", data={"username": "ana@example.com", "password": password})
+
+        for _ in range(limit - 1):
+            assert login("incorrecta").status_code == 401
+        assert login("secreta").status_code == 200
+
+        verifies = services.hasher.stats()["latency"]["verify"]["count"]
+        response = login("secreta")
+        assert response.status_code == 429
+        assert 1 <= int(response.headers["retry-after"]) <= services.login_limiter.window
+        assert services.hasher.stats()["latency"]["verify"]["count"] == verifies
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy import create_engine, insert, select, update
+
+import database
+from config import Settings
+from database import DBSession, get_replicas, new_session
+from models import Base, UserDB, UserDetailsDB
+
+# Primaria y réplica en dos archivos SQLite con el mismo usuario pero distinto
+# nombre: así se ve de qué base sale cada lectura (una réplica "con retraso")
+USERNAME = "ana@example.com"
+PASSWORD = "secreta"
+
+
+def seed(url: str, first_name: str):
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(UserDB).values(
+            id=1, username=USERNAME, hashed_password=CryptContext(schemes=["bcrypt"]).hash(PASSWORD)
+        ))
+        conn.execute(insert(UserDetailsDB).values(user_id=1, first_name=first_name, last_name="García"))
+    engine.dispose()
+
+
+def first_name(session):
+    return session.execute(select(UserDetailsDB.first_name).where(UserDetailsDB.user_id == 1)).scalar_one()
+
+
+def rename(session, name: str):
+    session.execute(update(UserDetailsDB).where(UserDetailsDB.user_id == 1).values(first_name=name))
+    session.commit()
+
+
+@pytest.fixture
+def urls(tmp_path):
+    primary = f"sqlite:///{tmp_path / 'primary.db'}"
+    replica = f"sqlite:///{tmp_path / 'replica.db'}"
+    seed(primary, "Primaria")
+    seed(replica, "Réplica")
+    yield primary, replica
+    asyncio.run(database.dispose_engine())
+
+
+async def read_twice(primary: str, replicas: list, write_first: bool = False):
+    database.configure(primary, replicas)
+    db = DBSession(new_session(), get_replicas())
+    try:
+        if write_first:
+            await db.run(rename, "Nueva")
+        return await db.read(first_name), await db.run(first_name)
+    finally:
+        await db.close()
+
+
+def test_read_goes_to_replica_and_run_to_primary(urls):
+    primary, replica = urls
+    assert asyncio.run(read_twice(primary, [replica])) == ("Réplica", "Primaria")
+    assert get_replicas().replicas[0].reads == 1
+
+
+def test_read_after_write_uses_primary(urls):
+    primary, replica = urls
+    assert asyncio.run(read_twice(primary, [replica], write_first=True)) == ("Nueva", "Nueva")
+    assert get_replicas().replicas[0].reads == 0
+
+
+def test_failed_replica_falls_back_to_primary(urls, tmp_path):
+    primary, _ = urls
+    missing = f"sqlite:///{tmp_path / 'no-existe' / 'replica.db'}"
+    assert asyncio.run(read_twice(primary, [missing])) == ("Primaria", "Primaria")
+    replicas = get_replicas()
+    assert replicas.fallbacks == 1
+    assert not replicas.replicas[0].healthy
+    assert replicas.choose() is None
+
+
+def test_no_replicas_reads_primary(urls):
+    primary, _ = urls
+    assert asyncio.run(read_twice(primary, [])) == ("Primaria", "Primaria")
+
+
+# La tabla del directorio queda en caché hasta el próximo cambio: se rellena
+# desde la primaria aunque haya réplicas, también justo después de un cambio
+def test_directory_cache_is_filled_from_primary(urls):
+    import main
+
+    primary, replica = urls
+    app = main.create_app(Settings(database_url=primary, replica_urls=[replica], create_schema=False))
+    with TestClient(app, base_url="https://testserver") as client:
+        assert client.post("/token", data={"username": USERNAME, "password": PASSWORD}).status_code == 200
+        page = client.get("/users/me/show").text
+        assert "Primaria" in page and "Réplica" not in page
+
+        response = client.put("/users/me/1", json={
+            "username": USERNAME, "first_name": "Cambiada", "last_name": "García", "current_password": PASSWORD,
+        })
+        assert response.status_code == 200
+        page = client.get("/users/me/show").text
+        assert "Cambiada" in page and "Réplica" not in page
+        assert app.state.services.directory_cache.stats()["entries"] == 1